@@ -0,0 +1,237 @@
+"""benchmarks the data layer against a synthetic archive served by
+fake_objstore, reporting timings, object store requests and memory.
+
+    python benchmarks/bench_data_interface.py --dates 365 --areas 200 --latency 0.02
+
+Results can be written as json with --output, to compare runs.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+# the benchmarks configure the page themselves, disable the metrics endpoint
+# and snapshot before constants is imported
+os.environ.setdefault('METRICS_PORT', '0')
+os.environ.pop('SNAPSHOT_PATH', None)
+os.environ.pop('IMAGE_CACHE_DIR', None)
+
+import fake_objstore  # noqa: E402
+
+ARCHIVE = fake_objstore.install()
+
+import constants  # noqa: E402
+import data_interface  # noqa: E402
+
+
+def get_percentiles(timings: list) -> dict:
+    timings = sorted(timings)
+    return {
+        'count': len(timings),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3)
+    }
+
+
+def measure(func, *args, **kwargs) -> dict:
+    """runs func once, returning its time, the object store requests it made
+    and the memory it allocated
+    """
+    ARCHIVE.reset_requests()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds': round(elapsed, 4),
+        'requests': dict(ARCHIVE.requests),
+        'retained_mb': round(current / 1024 / 1024, 2),
+        'peak_mb': round(peak / 1024 / 1024, 2)
+    }
+
+
+def bench_cold_start(background_refresh: bool) -> dict:
+    """creating a SnowPackData and loading the catalog without a snapshot,
+    as a new pod does
+    """
+    def cold_start():
+        spd = data_interface.SnowPackData(background_refresh=background_refresh)
+        spd.warm_start(snapshot_path=None)
+        if spd.refresher:
+            spd.refresher.stop()
+    return measure(cold_start)
+
+
+def bench_get_all_data(bulk_listing: bool) -> dict:
+    def get_all_data():
+        spd = data_interface.SnowPackData(background_refresh=False)
+        spd.get_all_data(bulk_listing=bulk_listing)
+    return measure(get_all_data)
+
+
+def bench_warm_lookups(iterations: int) -> dict:
+    """single lookups against a loaded catalog, what the page does on every
+    rerun
+    """
+    spd = data_interface.SnowPackData(background_refresh=True)
+    spd.refresh()
+    sats = [data_interface.Satellite[sat] for sat in constants.SAT_OPTIONS]
+    area_types = [data_interface.AreaType[area_type] for area_type in constants.WAT_BASIN_OPTIONS]
+    area_names = {area_type: list(spd.get_names(sat=sats[0], area_type=area_type))
+                  for area_type in area_types}
+    dates = {area_type: spd.get_dates(sat=sats[0], area_type=area_type)
+             for area_type in area_types}
+    rand = random.Random(1)
+
+    lookups = {
+        'get_dates': lambda sat, area_type, area_name, date_str: spd.get_dates(
+            sat=sat, area_type=area_type),
+        'get_names': lambda sat, area_type, area_name, date_str: spd.get_names(
+            sat=sat, area_type=area_type, date_str=date_str),
+        'get_url_by_date': lambda sat, area_type, area_name, date_str: spd.get_url_by_date(
+            date_str=date_str, area_name=area_name, sat=sat, area_type=area_type),
+        'get_area_history': lambda sat, area_type, area_name, date_str: spd.get_area_history(
+            area_name=area_name, area_type=area_type),
+        'search_area_names': lambda sat, area_type, area_name, date_str: spd.search_area_names(
+            query=area_name[0:rand.randint(1, len(area_name))], area_type=area_type)
+    }
+    results = {}
+    ARCHIVE.reset_requests()
+    for lookup_name, lookup in lookups.items():
+        timings = []
+        for _ in range(iterations):
+            sat = rand.choice(sats)
+            area_type = rand.choice(area_types)
+            area_name = rand.choice(area_names[area_type])
+            date_str = rand.choice(dates[area_type])
+            start = time.perf_counter()
+            lookup(sat, area_type, area_name, date_str)
+            timings.append(time.perf_counter() - start)
+        results[lookup_name] = get_percentiles(timings)
+    results['requests'] = dict(ARCHIVE.requests)
+    return results
+
+
+def interact(app, rand: random.Random):
+    """changes one of the widgets on the page, as a user would"""
+    action = rand.choice(('area', 'area', 'area_type', 'sat', 'more'))
+    if action == 'area' and app.selectbox:
+        app.selectbox[0].select(rand.choice(app.selectbox[0].options))
+    elif action == 'area_type':
+        app.radio[0].set_value(rand.choice(constants.WAT_BASIN_OPTIONS))
+    elif action == 'sat':
+        app.multiselect[0].set_value(
+            rand.sample(constants.SAT_OPTIONS, rand.randint(1, len(constants.SAT_OPTIONS))))
+    elif app.button and not app.button[0].disabled:
+        app.button[0].click()
+
+
+def bench_sessions(sessions: int, interactions: int) -> dict:
+    """reruns main.py for a number of browser sessions, each loads the page
+    then makes a series of widget interactions.  The sessions take turns,
+    streamlit's app test runner can't run scripts concurrently, but they
+    share the SnowPackData / image cache created by the first rerun as
+    concurrent sessions do.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    ARCHIVE.reset_requests()
+    start = time.perf_counter()
+    apps = [(AppTest.from_file(os.path.join(SRC_DIR, 'main.py'), default_timeout=120),
+             random.Random(session_num))
+            for session_num in range(sessions)]
+    timings = []
+    errors = 0
+    for interaction in range(interactions + 1):
+        for session_num, (app, rand) in enumerate(apps):
+            if interaction:
+                interact(app, rand)
+            rerun_start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - rerun_start)
+            if app.exception:
+                errors += 1
+                print(f"session {session_num} rerun raised: {app.exception[0].message}")
+    results = get_percentiles(timings)
+    results['errors'] = errors
+    results['seconds'] = round(time.perf_counter() - start, 4)
+    results['requests'] = dict(ARCHIVE.requests)
+    results['requests_per_rerun'] = round(
+        sum(ARCHIVE.requests.values()) / len(timings), 2)
+    return results
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dates', type=int, default=365,
+                        help='number of dates in the synthetic archive')
+    parser.add_argument('--areas', type=int, default=200,
+                        help='number of areas per area type')
+    parser.add_argument('--sats', nargs='+', default=constants.SAT_OPTIONS)
+    parser.add_argument('--area-types', nargs='+', default=constants.WAT_BASIN_OPTIONS)
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='seconds added to every object store request')
+    parser.add_argument('--page-latency', type=float, default=0.0,
+                        help='seconds added for every 1000 objects listed')
+    parser.add_argument('--iterations', type=int, default=1000,
+                        help='number of each warm lookup')
+    parser.add_argument('--sessions', type=int, default=4,
+                        help='number of page sessions, 0 to skip')
+    parser.add_argument('--interactions', type=int, default=10,
+                        help='widget interactions per session')
+    parser.add_argument('--skip-per-date', action='store_true',
+                        help='skip get_all_data with per date listings, which '
+                             'is slow with long archives')
+    parser.add_argument('--output', help='write the results to this json file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = get_args(argv)
+    ARCHIVE.latency = args.latency
+    ARCHIVE.page_latency = args.page_latency
+    ARCHIVE.generate(sats=args.sats, area_types=args.area_types,
+                     number_of_dates=args.dates, number_of_areas=args.areas)
+    print(f"archive: {len(ARCHIVE.keys)} objects, {args.dates} dates, "
+          f"{args.areas} areas, latency {args.latency}s")
+
+    results = {'archive': {'objects': len(ARCHIVE.keys), 'dates': args.dates,
+                           'areas': args.areas, 'latency': args.latency,
+                           'page_latency': args.page_latency}}
+    results['cold_start'] = bench_cold_start(background_refresh=constants.BACKGROUND_REFRESH)
+    print(f"cold start: {results['cold_start']}")
+    results['get_all_data_bulk'] = bench_get_all_data(bulk_listing=True)
+    print(f"get_all_data (bulk listing): {results['get_all_data_bulk']}")
+    if not args.skip_per_date:
+        results['get_all_data_per_date'] = bench_get_all_data(bulk_listing=False)
+        print(f"get_all_data (per date listings): {results['get_all_data_per_date']}")
+    results['warm_lookups'] = bench_warm_lookups(iterations=args.iterations)
+    for lookup_name, lookup_results in results['warm_lookups'].items():
+        print(f"warm {lookup_name}: {lookup_results}")
+    if args.sessions:
+        results['sessions'] = bench_sessions(sessions=args.sessions,
+                                             interactions=args.interactions)
+        print(f"{args.sessions} sessions x {args.interactions} interactions: "
+              f"{results['sessions']}")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""in process stand in for NRUtil.NRObjStoreUtil.ObjectStoreUtil, used by
+the benchmarks to run the data layer against a synthetic plot archive with
+configurable latency, without an object store.
+"""
+import bisect
+import collections
+import datetime
+import hashlib
+import io
+import threading
+import time
+
+import NRUtil.constants
+import NRUtil.NRObjStoreUtil
+import PIL.Image
+import requests
+import requests.adapters
+
+
+class FakeArchive():
+    """a sorted list of object names making up the plot archive, with the
+    latency to apply to requests and counts of the requests made
+    """
+    def __init__(self, latency: float=0.0, page_latency: float=0.0,
+                 page_size: int=1000):
+        """
+        :param latency: seconds added to every request
+        :type latency: float, optional
+        :param page_latency: seconds added for every page of page_size
+            objects a listing returns, object storage returns listings a page
+            at a time
+        :type page_latency: float, optional
+        :param page_size: objects per listing page
+        :type page_size: int, optional
+        """
+        self.latency = latency
+        self.page_latency = page_latency
+        self.page_size = page_size
+        self.keys = []
+        self.objects = {}
+        self.public = set()
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+
+    def generate(self,
+                 sats=('modis', 'viirs'),
+                 area_types=('watersheds', 'basins'),
+                 number_of_dates: int=365,
+                 number_of_areas: int=200,
+                 end_date: datetime.date=None,
+                 archive_dir: str='snowpack_archive/plot'):
+        """replaces the archive with one plot per satellite / area type /
+        date / area, for the number_of_dates days ending at end_date
+        (yesterday by default)
+        """
+        if end_date is None:
+            end_date = datetime.date.today() - datetime.timedelta(days=1)
+        # the page defaults to the Boundary area
+        area_names = ['Boundary'] + [f'Area_{area_num:05d}_River'
+                                     for area_num in range(1, number_of_areas)]
+        keys = []
+        for days_back in range(number_of_dates):
+            date_str = (end_date - datetime.timedelta(days=days_back)).strftime('%Y.%m.%d')
+            for sat in sats:
+                for area_type in area_types:
+                    for area_name in area_names:
+                        keys.append(f'{archive_dir}/{sat}/{area_type}/{date_str}/{area_name}.png')
+        keys.sort()
+        self.keys = keys
+        self.public = set()
+
+    def add_request(self, operation: str, objects_returned: int=0):
+        with self.lock:
+            self.requests[operation] += 1
+        pages = max(1, -(-objects_returned // self.page_size))
+        delay = self.latency + self.page_latency * pages
+        if delay:
+            time.sleep(delay)
+
+    def reset_requests(self):
+        with self.lock:
+            self.requests = collections.Counter()
+
+    def list(self, prefix: str='', recursive: bool=True,
+             start_after: str=None) -> list:
+        """returns the object names under prefix, if not recursive the
+        'directories' directly under prefix are returned ending in '/'
+        """
+        prefix = prefix or ''
+        start = bisect.bisect_left(self.keys, prefix)
+        if start_after:
+            start = max(start, bisect.bisect_right(self.keys, start_after))
+        names = []
+        last_dir = None
+        for key in self.keys[start:]:
+            if not key.startswith(prefix):
+                break
+            if not recursive:
+                rest = key[len(prefix):]
+                if '/' in rest:
+                    cur_dir = prefix + rest.split('/', 1)[0] + '/'
+                    if cur_dir != last_dir and (not start_after or cur_dir > start_after):
+                        names.append(cur_dir)
+                    last_dir = cur_dir
+                    continue
+            names.append(key)
+        return names
+
+
+class FakeObject():
+    def __init__(self, object_name: str):
+        self.object_name = object_name
+        self.is_dir = object_name.endswith('/')
+
+
+class FakeMinio():
+    """the subset of minio.Minio used through ObjectStoreUtil.minio_client"""
+    def __init__(self, archive: FakeArchive):
+        self.archive = archive
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False,
+                     start_after=None, use_url_encoding_type=True, **kwargs):
+        names = self.archive.list(prefix=prefix, recursive=recursive,
+                                  start_after=start_after)
+        self.archive.add_request('list_objects', len(names))
+        return (FakeObject(name) for name in names)
+
+
+class FakeObjectStoreUtil():
+    """stands in for NRUtil.NRObjStoreUtil.ObjectStoreUtil, every instance
+    shares the class level archive
+    """
+    archive = FakeArchive()
+
+    def __init__(self, obj_store_host=None, obj_store_user=None,
+                 obj_store_secret=None, obj_store_bucket=None, tmpfolder=None):
+        self.obj_store_host = obj_store_host or NRUtil.constants.OBJ_STORE_HOST
+        self.obj_store_user = obj_store_user
+        self.obj_store_secret = obj_store_secret
+        self.obj_store_bucket = obj_store_bucket or getattr(
+            NRUtil.constants, 'OBJ_STORE_BUCKET', None)
+        self.fake_minio_client = FakeMinio(self.archive)
+
+    @property
+    def minio_client(self):
+        return self.fake_minio_client
+
+    @minio_client.setter
+    def minio_client(self, minio_client):
+        # the pooled client created by objstore_client is ignored, requests
+        # are always answered from the archive
+        pass
+
+    def list_objects(self, objstore_dir=None, recursive=True,
+                     return_file_names_only=False):
+        names = self.archive.list(prefix=objstore_dir, recursive=recursive)
+        self.archive.add_request('list_objects', len(names))
+        if return_file_names_only:
+            return names
+        return [FakeObject(name) for name in names]
+
+    def get_public_permission(self, object_name, bucket_name=None):
+        self.archive.add_request('get_public_permission')
+        return 'READ' if object_name in self.archive.public else None
+
+    def set_public_permissions(self, object_name, bucket_name=None):
+        self.archive.add_request('set_public_permissions')
+        self.archive.public.add(object_name)
+
+    def put_object(self, ostore_path, local_path, bucket_name=None, public=False):
+        self.archive.add_request('put_object')
+        with open(local_path, 'rb') as fh:
+            self.archive.objects[ostore_path] = fh.read()
+        if public:
+            self.archive.public.add(ostore_path)
+
+    def get_object(self, file_path, local_path, bucket_name=None):
+        self.archive.add_request('get_object')
+        with open(local_path, 'wb') as fh:
+            fh.write(self.archive.objects[file_path])
+
+
+class FakeImageAdapter(requests.adapters.BaseAdapter):
+    """answers GETs for objects that have been put to the archive (ie the
+    manifest) with their content, and every other GET with the same small
+    png.  Responses have an ETag so they can be revalidated.
+    """
+    def __init__(self, archive: FakeArchive, width: int=1200, height: int=900):
+        super().__init__()
+        self.archive = archive
+        output = io.BytesIO()
+        PIL.Image.new('RGB', (width, height), (40, 90, 160)).save(output, format='PNG')
+        self.content = output.getvalue()
+        self.etag = f'"{hashlib.md5(self.content).hexdigest()}"'
+
+    def send(self, request, **kwargs):
+        # https://<host>/<bucket>/<object name>
+        object_name = request.path_url.lstrip('/').split('/', 1)[-1]
+        if object_name in self.archive.objects:
+            self.archive.add_request('get_object', 1)
+            content = self.archive.objects[object_name]
+            etag = f'"{hashlib.md5(content).hexdigest()}"'
+        else:
+            self.archive.add_request('get_image', 1)
+            content = self.content
+            etag = self.etag
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers['ETag'] = etag
+        if request.headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = content
+        return response
+
+    def close(self):
+        pass
+
+
+def install(archive: FakeArchive=None) -> FakeArchive:
+    """replaces ObjectStoreUtil with FakeObjectStoreUtil, and routes every
+    requests.Session created afterwards to FakeImageAdapter, returns the
+    archive in use
+    """
+    if archive is not None:
+        FakeObjectStoreUtil.archive = archive
+    archive = FakeObjectStoreUtil.archive
+    # only set by NRUtil if they are in the environment
+    if not getattr(NRUtil.constants, 'OBJ_STORE_HOST', None):
+        NRUtil.constants.OBJ_STORE_HOST = 'objectstore.example'
+    if not getattr(NRUtil.constants, 'OBJ_STORE_BUCKET', None):
+        NRUtil.constants.OBJ_STORE_BUCKET = 'snowpack'
+    NRUtil.NRObjStoreUtil.ObjectStoreUtil = FakeObjectStoreUtil
+
+    adapter = FakeImageAdapter(archive)
+
+    class FakeSession(requests.Session):
+        def get_adapter(self, url):
+            return adapter
+
+    requests.Session = FakeSession
+    return archive
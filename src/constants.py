@@ -1,4 +1,107 @@
+import os
+
 WAT_BASIN_OPTIONS = ['watersheds', 'basins']
 SAT_OPTIONS = ['modis', 'viirs']
 
-DAYS_BACK = 10
+# area shown when the page is first loaded
+DEFAULT_AREA_NAME = os.getenv('DEFAULT_AREA_NAME', 'Boundary')
+
+# maximum number of areas listed by the area search
+AREA_SEARCH_LIMIT = int(os.getenv('AREA_SEARCH_LIMIT', 50))
+
+# number of the most recent dates shown
+DAYS_BACK = int(os.getenv('DAYS_BACK', 10))
+# number of dates shown at a time, more are loaded on request up to DAYS_BACK
+DATES_PER_PAGE = int(os.getenv('DATES_PER_PAGE', 3))
+
+# number of seconds that the catalog of dates / area names retrieved from
+# object storage is considered current, after which it is re-read.
+CATALOG_TTL = int(os.getenv('CATALOG_TTL', 60 * 60))
+
+# maximum number of satellite / area type / date combinations whose area names
+# are held in memory, the default holds about two years of history for two
+# satellites and two area types
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 3000))
+
+# number of previous years searched when comparing a date to the same date in
+# earlier seasons
+YEARS_BACK = int(os.getenv('YEARS_BACK', 5))
+
+# number of concurrent object store listings used to warm the cache, and the
+# number of seconds to wait for each listing, from when it starts
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 8))
+PREFETCH_TIMEOUT = float(os.getenv('PREFETCH_TIMEOUT', 30))
+
+# file used to persist the catalog between restarts, not used if not set.
+# Snapshots older than SNAPSHOT_MAX_AGE seconds are ignored
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH')
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', 7 * 24 * 60 * 60))
+
+# object name of the catalog manifest written by manifest.py.  When set the
+# catalog is read from the manifest with a single request, rather than listing
+# the archive, unless it is older than MANIFEST_MAX_AGE seconds
+MANIFEST_OBJECT = os.getenv('MANIFEST_OBJECT')
+MANIFEST_MAX_AGE = int(os.getenv('MANIFEST_MAX_AGE', 2 * 24 * 60 * 60))
+
+# when enabled the catalog is refreshed from object storage by a background
+# thread, and page requests are always answered from the cached catalog.
+# REFRESH_INTERVAL is the normal number of seconds between refreshes,
+# REFRESH_PENDING_INTERVAL is used while the latest days plots have not yet
+# been published.  After a failed refresh, or a failed first load, the retries
+# back off from REFRESH_RETRY_INTERVAL up to REFRESH_MAX_BACKOFF seconds, the
+# first retries are well inside the startup probe's allowance (5s *
+# warmup_probe_failures in the helm values).  Refreshes only
+# list the dates after the newest known date, except every
+# REFRESH_FULL_INTERVAL seconds when the whole archive is re-listed.
+BACKGROUND_REFRESH = os.getenv('BACKGROUND_REFRESH', 'true').lower() == 'true'
+REFRESH_INTERVAL = float(os.getenv('REFRESH_INTERVAL', 60 * 60))
+REFRESH_PENDING_INTERVAL = float(os.getenv('REFRESH_PENDING_INTERVAL', 10 * 60))
+REFRESH_RETRY_INTERVAL = float(os.getenv('REFRESH_RETRY_INTERVAL', 15))
+REFRESH_MAX_BACKOFF = float(os.getenv('REFRESH_MAX_BACKOFF', 60 * 60))
+REFRESH_FULL_INTERVAL = float(os.getenv('REFRESH_FULL_INTERVAL', 24 * 60 * 60))
+
+# plot images are proxied through an in memory cache, and optionally a disk
+# cache in IMAGE_CACHE_DIR, each limited to the number of bytes configured.
+# Cached images are revalidated against object storage after IMAGE_MAX_AGE
+# seconds.
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR')
+IMAGE_CACHE_MEMORY_BYTES = int(os.getenv('IMAGE_CACHE_MEMORY_BYTES', 32 * 1024 * 1024))
+IMAGE_CACHE_DISK_BYTES = int(os.getenv('IMAGE_CACHE_DISK_BYTES', 200 * 1024 * 1024))
+IMAGE_MAX_AGE = int(os.getenv('IMAGE_MAX_AGE', 24 * 60 * 60))
+IMAGE_FETCH_TIMEOUT = float(os.getenv('IMAGE_FETCH_TIMEOUT', 10))
+# number of images fetched / scaled concurrently for a page
+IMAGE_FETCH_WORKERS = int(os.getenv('IMAGE_FETCH_WORKERS', 8))
+
+# the page shows plots scaled down to RENDITION_WIDTH pixels wide, encoded as
+# RENDITION_FORMAT, with a link to the full resolution image
+RENDITION_WIDTH = int(os.getenv('RENDITION_WIDTH', 600))
+RENDITION_FORMAT = os.getenv('RENDITION_FORMAT', 'WEBP')
+
+# connections to object storage are pooled and shared by the process, up to
+# OBJSTORE_POOL_SIZE per host.  Failed requests are retried OBJSTORE_RETRIES
+# times, backing off OBJSTORE_BACKOFF * 2 ** retry seconds plus up to
+# OBJSTORE_BACKOFF_JITTER random seconds
+OBJSTORE_POOL_SIZE = int(os.getenv('OBJSTORE_POOL_SIZE', 16))
+OBJSTORE_RETRIES = int(os.getenv('OBJSTORE_RETRIES', 3))
+OBJSTORE_BACKOFF = float(os.getenv('OBJSTORE_BACKOFF', 0.2))
+OBJSTORE_BACKOFF_JITTER = float(os.getenv('OBJSTORE_BACKOFF_JITTER', 0.5))
+OBJSTORE_CONNECT_TIMEOUT = float(os.getenv('OBJSTORE_CONNECT_TIMEOUT', 5))
+OBJSTORE_READ_TIMEOUT = float(os.getenv('OBJSTORE_READ_TIMEOUT', 30))
+
+# publish.py makes the plots public with PUBLISH_WORKERS concurrent requests,
+# limited to PUBLISH_RATE requests per second
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', 8))
+PUBLISH_RATE = float(os.getenv('PUBLISH_RATE', 20))
+
+# call counts / latencies and object store requests are served in the
+# prometheus text format on METRICS_PORT, and / or logged as a summary every
+# METRICS_LOG_INTERVAL seconds.  Either is disabled when set to 0
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9100))
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', 0))
+
+# before reporting ready (/readyz on METRICS_PORT) the catalog is loaded, and
+# the renditions for the WARMUP_IMAGE_DATES newest dates of the default page
+# are cached, 0 skips caching images.  Readiness also waits for streamlit to
+# accept connections on APP_PORT
+WARMUP_IMAGE_DATES = int(os.getenv('WARMUP_IMAGE_DATES', DATES_PER_PAGE))
+APP_PORT = int(os.getenv('STREAMLIT_SERVER_PORT', 8501))
@@ -1,11 +1,25 @@
-import NRUtil.NRObjStoreUtil
 import NRUtil.constants
 import os.path
 import logging
 import enum
 import constants
+import metrics
+import objstore_client
 from typing_extensions import TypedDict
 import datetime
+import time
+import collections
+import copy
+import concurrent.futures
+import threading
+import json
+import gzip
+import math
+import bisect
+import array
+import sys
+import re
+import requests
 
 LOGGER = logging.getLogger(__name__)
 
@@ -16,14 +30,206 @@ LOGGER = logging.getLogger(__name__)
 Satellite = enum.Enum('Satellite', constants.SAT_OPTIONS)
 AreaType = enum.Enum('AreaType', constants.WAT_BASIN_OPTIONS)
 
+# increment when the structure written by SnowPackData.save_snapshot changes
+SNAPSHOT_VERSION = 1
+# the area index packs a date and satellite into one integer:
+# date_to_int(date_str) * SAT_FACTOR + sat.value
+SAT_FACTOR = 100
+# format of the date directories in the plot archive, 'YYYY.MM.DD'
+DATE_PATTERN = re.compile(r'\d{4}\.\d{2}\.\d{2}')
+
+
+class AreaNames():
+    """interned table of the area (watershed / basin) image file names.
+    Each distinct file name is stored once, along with its display name, and
+    is referred to everywhere else by its integer id.
+    """
+    __slots__ = ('ids', 'name_ids', 'file_names', 'names')
+
+    def __init__(self):
+        self.ids = {}        # file name -> id
+        self.name_ids = {}   # display name -> id
+        self.file_names = [] # id -> file name, ie 'West_Kootenay.png'
+        self.names = []      # id -> display name, ie 'West Kootenay'
+
+    def get_id(self, file_name: str) -> int:
+        """returns the id for file_name, adding it to the table if it isn't
+        already there.  The display name is the file name without the suffix
+        and with any '_' replaced by spaces
+        """
+        area_id = self.ids.get(file_name)
+        if area_id is None:
+            area_id = len(self.file_names)
+            name = os.path.splitext(file_name)[0].replace("_", " ")
+            self.ids[file_name] = area_id
+            self.name_ids.setdefault(name, area_id)
+            self.file_names.append(file_name)
+            self.names.append(name)
+        return area_id
+
+
+class AreaNameIndex():
+    """sorted prefix / word index over the display names of the areas of one
+    area type / date, for type ahead search.  Holds area ids, so the display
+    names and image file names are read from the AreaNames table rather than
+    re-derived.
+    """
+    __slots__ = ('area_names', 'keys', 'area_ids', 'words', 'word_positions')
+
+    def __init__(self, area_names: AreaNames, area_ids):
+        """
+        :param area_names: the table the area ids refer to
+        :type area_names: AreaNames
+        :param area_ids: ids of the areas to index
+        :type area_ids: iterable of int
+        """
+        self.area_names = area_names
+        entries = sorted((area_names.names[area_id].lower(), area_id)
+                         for area_id in set(area_ids))
+        # lower case display names, sorted, and the area id of each
+        self.keys = [key for key, _ in entries]
+        self.area_ids = array.array('I', (area_id for _, area_id in entries))
+        # every word of every name, sorted, and the position of the name
+        # in keys
+        words = sorted((word, position) for position, key in enumerate(self.keys)
+                       for word in set(key.split()))
+        self.words = [word for word, _ in words]
+        self.word_positions = array.array('I', (position for _, position in words))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, name: str) -> bool:
+        position = bisect.bisect_left(self.keys, name.lower())
+        while position < len(self.keys) and self.keys[position] == name.lower():
+            if self.area_names.names[self.area_ids[position]] == name:
+                return True
+            position += 1
+        return False
+
+    def get_names(self) -> list:
+        """returns every display name, sorted case insensitively"""
+        names = self.area_names.names
+        return [names[area_id] for area_id in self.area_ids]
+
+    def search(self, query: str, limit: int=constants.AREA_SEARCH_LIMIT) -> list:
+        """returns up to `limit` display names matching query, case
+        insensitively.  Names that start with the query come first, followed
+        by the names with a word starting with each word of the query, ie
+        'kootenay w' matches 'West Kootenay'.
+
+        :param query: the text typed so far, an empty query matches every
+            name
+        :type query: str
+        :param limit: maximum number of names returned, defaults to
+            constants.AREA_SEARCH_LIMIT
+        :type limit: int, optional
+        :return: list of display names
+        :rtype: list
+        """
+        query_words = query.lower().split()
+        start, end = get_prefix_range(self.keys, ' '.join(query_words))
+        positions = list(range(start, min(end, start + limit)))
+        if query_words and len(positions) < limit:
+            matched = set(positions)
+            # the candidates are the names with a word starting with the
+            # query word that matches the fewest words
+            word_ranges = [get_prefix_range(self.words, query_word)
+                           for query_word in query_words]
+            start, end = min(word_ranges, key=lambda word_range: word_range[1] - word_range[0])
+            for position in sorted(set(self.word_positions[start:end])):
+                if position in matched:
+                    continue
+                words = self.keys[position].split()
+                if all(any(word.startswith(query_word) for word in words)
+                       for query_word in query_words):
+                    positions.append(position)
+                    if len(positions) >= limit:
+                        break
+        names = self.area_names.names
+        return [names[self.area_ids[position]] for position in positions]
+
+
+def get_prefix_range(sorted_strings: list, prefix: str) -> tuple:
+    """returns the (start, end) slice of sorted_strings that start with
+    prefix
+    """
+    start = bisect.bisect_left(sorted_strings, prefix)
+    end = bisect.bisect_left(sorted_strings, prefix + '\uffff', lo=start)
+    return start, end
+
+
+def date_to_int(date_str: str) -> int:
+    """converts a date string 'YYYY.MM.DD' to the integer YYYYMMDD"""
+    return int(date_str.replace('.', ''))
+
+
+def int_to_date(date_int: int) -> str:
+    """converts an integer YYYYMMDD back to the date string 'YYYY.MM.DD'"""
+    date_digits = str(date_int)
+    return f'{date_digits[0:4]}.{date_digits[4:6]}.{date_digits[6:8]}'
+
 
 class CacheData():
     """interface to cache data retrieved from object store to reduce the number
     of times the object store api needs to be called
+
+    Names are cached per (Satellite, AreaType, date_str) combination in a
+    bounded least recently used cache, every entry expires after `ttl`
+    seconds (never if ttl is None).  Hit / miss / eviction counters are
+    available through get_stats()
+
+    The cached names are also indexed by (AreaType, area name), giving the
+    dates / satellites / urls that are cached for an area, see
+    get_area_history()
+
+    To keep the memory used proportional to the number of distinct areas,
+    area names are interned in an AreaNames table, each cached
+    satellite / area type / date holds an array of area ids, and the area
+    index holds one packed integer (date, satellite) per image.  Urls are
+    built from url_prefix when requested.
     """
-    def __init__(self):
-        self.CACHE_DATA = {}
+    def __init__(self,
+                 max_entries: int=constants.CACHE_MAX_ENTRIES,
+                 ttl: int=constants.CATALOG_TTL,
+                 url_prefix: str=''):
+        """
+        :param max_entries: maximum number of satellite/area_type/date
+            combinations that are retained, once exceeded the least recently
+            used entry is evicted, defaults to constants.CACHE_MAX_ENTRIES
+        :type max_entries: int, optional
+        :param ttl: number of seconds an entry is retained, None to retain
+            entries until they are evicted, defaults to constants.CATALOG_TTL
+        :type ttl: int, optional
+        :param url_prefix: the url to the plot directory, urls are created
+            as <url_prefix><sat>/<area_type>/<date_str>/<file name>
+        :type url_prefix: str, optional
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.url_prefix = url_prefix
+        # the cache is populated from the prefetch worker threads as well as
+        # the streamlit script threads
+        self.lock = threading.RLock()
+        self.area_names = AreaNames()
+        # (sat, area_type, date_str) -> (expiry time, array of area ids)
+        self.CACHE_DATA = collections.OrderedDict()
+        # (sat, area_type) -> (expiry time, dates)
         self.CACHE_DATES = {}
+        # (area_type, area id) -> sorted array of date_int * SAT_FACTOR + sat.value
+        self.AREA_INDEX = {}
+        # area_type -> date_str -> bitset of the satellites with the date,
+        # bit sat.value is set when the satellite has the date
+        self.AVAILABILITY = {}
+        # area_type -> sorted list of the dates any satellite has
+        self.AVAILABLE_DATES = {}
+        # (area_type, date_str) -> AreaNameIndex over the names every
+        # satellite has for the date, built on first use
+        self.NAME_INDEXES = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
     def get_cache(self,
                   sat: Satellite,
@@ -43,93 +249,1266 @@ class CacheData():
             snowpack comparison
         :rtype: dict
         """
-        cache_data = self._get_cache(sat, area_type, date_str, self.CACHE_DATA)
+        key = (sat, area_type, date_str)
+        cache_data = None
+        with self.lock:
+            if key in self.CACHE_DATA:
+                expires, area_ids = self.CACHE_DATA[key]
+                if expires > time.monotonic():
+                    self.CACHE_DATA.move_to_end(key)
+                    cache_data = self.get_name_url_dict(key, area_ids)
+                else:
+                    LOGGER.debug(f"cache entry expired: {key}")
+                    del self.CACHE_DATA[key]
+                    self._unindex_names(key, area_ids)
+                    self.expirations += 1
+
+            if cache_data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
         return cache_data
 
-    # TODO: define mypy type for data
     def set_cache(self,
                   sat: Satellite,
                   area_type:AreaType,
                   date_str:str,
-                  data):
-         self._set_cache(sat, area_type, date_str, data, self.CACHE_DATA)
-
-    def _get_cache(self, sat: Satellite,
-                  area_type:AreaType, date_str, cache):
-        cache_data = None
-        if (( sat in cache ) and \
-                area_type in cache[sat]) and \
-                date_str in cache[sat][area_type] and \
-                cache[sat][area_type][date_str]:
-            cache_data = cache[sat][area_type][date_str]
+                  file_names: list):
+        """caches the image file names for a satellite/area_type/date
+        combination
 
-    def _set_cache(self,
-                  sat: Satellite,
-                  area_type:AreaType,
-                  date_str:str,
-                  data,
-                  cache):
-        if sat not in cache:
-            cache[sat] = {}
-        if area_type not in cache[sat]:
-            cache[sat][area_type] = {}
+        :param file_names: the image file names, ie 'West_Kootenay.png'
+        :type file_names: list
+        """
+        key = (sat, area_type, sys.intern(date_str))
         LOGGER.debug(f"date added for: {date_str}")
-        cache[sat][area_type][date_str] = data
+        with self.lock:
+            area_ids = array.array('I', sorted(
+                self.area_names.get_id(file_name) for file_name in file_names))
+            if key in self.CACHE_DATA:
+                self._unindex_names(key, self.CACHE_DATA[key][1])
+            self.CACHE_DATA[key] = (self.get_expiry(), area_ids)
+            self.CACHE_DATA.move_to_end(key)
+            self._index_names(key, area_ids)
+            while len(self.CACHE_DATA) > self.max_entries:
+                evicted_key, (_, evicted_ids) = self.CACHE_DATA.popitem(last=False)
+                self._unindex_names(evicted_key, evicted_ids)
+                LOGGER.debug(f"evicted from cache: {evicted_key}")
+                self.evictions += 1
+
+    def get_url(self,
+                sat: Satellite,
+                area_type: AreaType,
+                date_str: str,
+                area_id: int) -> str:
+        """builds the url to an image"""
+        file_name = self.area_names.file_names[area_id]
+        return f'{self.url_prefix}{sat.name}/{area_type.name}/{date_str}/{file_name}'
+
+    def get_name_url_dict(self, key: tuple, area_ids) -> dict:
+        """returns the area name / url dictionary for a cached
+        (sat, area_type, date_str) key and its area ids
+        """
+        names = self.area_names.names
+        return {names[area_id]: self.get_url(*key, area_id) for area_id in area_ids}
+
+    def _index_names(self, key: tuple, area_ids):
+        sat, area_type, date_str = key
+        self.NAME_INDEXES.pop((area_type, date_str), None)
+        packed = date_to_int(date_str) * SAT_FACTOR + sat.value
+        for area_id in area_ids:
+            area_history = self.AREA_INDEX.get((area_type, area_id))
+            if area_history is None:
+                area_history = self.AREA_INDEX[(area_type, area_id)] = array.array('Q')
+            bisect.insort(area_history, packed)
+
+    def _unindex_names(self, key: tuple, area_ids):
+        sat, area_type, date_str = key
+        self.NAME_INDEXES.pop((area_type, date_str), None)
+        packed = date_to_int(date_str) * SAT_FACTOR + sat.value
+        for area_id in area_ids:
+            area_history = self.AREA_INDEX.get((area_type, area_id))
+            if not area_history:
+                continue
+            remove_at = bisect.bisect_left(area_history, packed)
+            if remove_at < len(area_history) and area_history[remove_at] == packed:
+                del area_history[remove_at]
+            if not area_history:
+                del self.AREA_INDEX[(area_type, area_id)]
+
+    def get_area_history(self,
+                         area_type: AreaType,
+                         area_name: str,
+                         start_date: str=None,
+                         end_date: str=None) -> list:
+        """returns every cached image for an area, across all dates and
+        satellites, from the area index.  The index is sorted by date so a
+        date range is sliced out of it with bisect.
+
+        :param area_type: the area type
+        :type area_type: AreaType
+        :param area_name: the name of the watershed / basin
+        :type area_name: str
+        :param start_date: first date to return, format 'YYYY.MM.DD',
+            defaults to None, no lower limit
+        :type start_date: str, optional
+        :param end_date: last date to return, format 'YYYY.MM.DD', defaults to
+            None, no upper limit
+        :type end_date: str, optional
+        :return: list of tuples of (date_str, Satellite, url), sorted by date
+        :rtype: list
+        """
+        area_history = []
+        with self.lock:
+            area_id = self.area_names.name_ids.get(area_name)
+            packed_history = self.AREA_INDEX.get((area_type, area_id), [])
+            start = 0
+            end = len(packed_history)
+            if start_date:
+                start = bisect.bisect_left(packed_history,
+                                           date_to_int(start_date) * SAT_FACTOR)
+            if end_date:
+                end = bisect.bisect_left(packed_history,
+                                         (date_to_int(end_date) + 1) * SAT_FACTOR)
+            for packed in packed_history[start:end]:
+                date_int, sat_value = divmod(packed, SAT_FACTOR)
+                date_str = int_to_date(date_int)
+                sat = Satellite(sat_value)
+                area_history.append(
+                    (date_str, sat, self.get_url(sat, area_type, date_str, area_id)))
+        return area_history
+
+    def get_name_index(self,
+                       area_type: AreaType,
+                       date_str: str) -> AreaNameIndex:
+        """returns the index over the area names that any satellite has for
+        an area type / date.  Built from the cached names on first use, and
+        rebuilt after the names for the date change.
+
+        :return: the index, or None if no names are cached for the date
+        :rtype: AreaNameIndex
+        """
+        key = (area_type, date_str)
+        with self.lock:
+            name_index = self.NAME_INDEXES.get(key)
+            if name_index is None:
+                area_ids = set()
+                for sat in Satellite:
+                    cache_entry = self.CACHE_DATA.get((sat, area_type, date_str))
+                    if cache_entry is not None:
+                        area_ids.update(cache_entry[1])
+                if not area_ids:
+                    return None
+                name_index = self.NAME_INDEXES[key] = AreaNameIndex(
+                    self.area_names, area_ids)
+        return name_index
+
+    def get_url_matrix(self,
+                       area_type: AreaType,
+                       area_name: str,
+                       sats: list,
+                       dates: list) -> dict:
+        """returns the url for every date / satellite combination for an
+        area, from the area index, in a single locked lookup.
+
+        :param area_type: the area type
+        :type area_type: AreaType
+        :param area_name: the name of the watershed / basin
+        :type area_name: str
+        :param sats: list of Satellite
+        :type sats: list
+        :param dates: list of date strings, format 'YYYY.MM.DD'
+        :type dates: list
+        :return: dictionary of date_str -> Satellite -> url, in the order of
+            dates / sats, the url is None if there is no image for the cell
+        :rtype: dict
+        """
+        url_matrix = {}
+        with self.lock:
+            area_id = self.area_names.name_ids.get(area_name)
+            packed_history = self.AREA_INDEX.get((area_type, area_id), [])
+            date_sats = self.AVAILABILITY.get(area_type, {})
+            for date_str in dates:
+                date_urls = url_matrix[date_str] = dict.fromkeys(sats)
+                sats_mask = date_sats.get(date_str, 0)
+                date_packed = date_to_int(date_str) * SAT_FACTOR
+                for sat in sats:
+                    if not sats_mask & (1 << sat.value):
+                        # the satellite has no images for the date
+                        continue
+                    packed = date_packed + sat.value
+                    found_at = bisect.bisect_left(packed_history, packed)
+                    if found_at < len(packed_history) and packed_history[found_at] == packed:
+                        date_urls[sat] = self.get_url(sat, area_type, date_str, area_id)
+        return url_matrix
 
     def get_cache_dates(self,
                         sat: Satellite,
-                        area_type:AreaType) -> dict:
+                        area_type:AreaType) -> list:
         dates = []
-        if (    (sat in self.CACHE_DATES) and \
-                area_type in self.CACHE_DATES[sat] ) and \
-                self.CACHE_DATES[sat][area_type]:
-           dates = self.CACHE_DATES[sat][area_type]
-           dates.sort()
+        key = (sat, area_type)
+        with self.lock:
+            if self._expire_dates(key):
+                # kept sorted by set_cache_dates / merge_cache_dates
+                dates = list(self.CACHE_DATES[key][1])
         LOGGER.debug(f"dates from cache: {dates}")
         return dates
 
+    def _expire_dates(self, key: tuple) -> bool:
+        """removes the dates for a (sat, area_type) if they have expired,
+        returns True if unexpired dates are cached
+        """
+        if key not in self.CACHE_DATES:
+            return False
+        expires, cached_dates = self.CACHE_DATES[key]
+        if expires > time.monotonic():
+            return True
+        del self.CACHE_DATES[key]
+        self._set_available(*key, cached_dates, available=False)
+        self.expirations += 1
+        return False
+
+    def _set_available(self, sat: Satellite, area_type: AreaType, dates,
+                       available: bool=True):
+        """sets / clears the satellites bit in the availability of dates"""
+        sat_bit = 1 << sat.value
+        date_sats = self.AVAILABILITY.setdefault(area_type, {})
+        available_dates = self.AVAILABLE_DATES.setdefault(area_type, [])
+        for date_str in dates:
+            sats_mask = date_sats.get(date_str, 0)
+            if available and not sats_mask:
+                bisect.insort(available_dates, date_str)
+            sats_mask = sats_mask | sat_bit if available else sats_mask & ~sat_bit
+            if sats_mask:
+                date_sats[date_str] = sats_mask
+            elif date_str in date_sats:
+                del date_sats[date_str]
+                del available_dates[bisect.bisect_left(available_dates, date_str)]
+
+    def get_available_sats(self, area_type: AreaType, date_str: str) -> list:
+        """returns the satellites that have images for a date
+
+        :return: list of Satellite
+        :rtype: list
+        """
+        with self.lock:
+            for sat in Satellite:
+                self._expire_dates((sat, area_type))
+            sats_mask = self.AVAILABILITY.get(area_type, {}).get(date_str, 0)
+        return [sat for sat in Satellite if sats_mask & (1 << sat.value)]
+
+    def get_available_dates(self,
+                            area_type: AreaType,
+                            sats: list,
+                            require_all: bool=False) -> list:
+        """returns the dates that any (or all) of sats have images for
+
+        :param area_type: the area type
+        :type area_type: AreaType
+        :param sats: list of Satellite
+        :type sats: list
+        :param require_all: only return the dates that every satellite in
+            sats has, defaults to False
+        :type require_all: bool, optional
+        :return: sorted list of date strings
+        :rtype: list
+        """
+        wanted_mask = 0
+        for sat in sats:
+            wanted_mask |= 1 << sat.value
+        with self.lock:
+            for sat in sats:
+                self._expire_dates((sat, area_type))
+            date_sats = self.AVAILABILITY.get(area_type, {})
+            if require_all:
+                return [date_str for date_str in self.AVAILABLE_DATES.get(area_type, [])
+                        if date_sats[date_str] & wanted_mask == wanted_mask]
+            return [date_str for date_str in self.AVAILABLE_DATES.get(area_type, [])
+                    if date_sats[date_str] & wanted_mask]
+
+    def get_latest_common_date(self, area_type: AreaType, sats: list) -> str:
+        """returns the newest date that every satellite in sats has images
+        for, or None if there isn't one
+        """
+        wanted_mask = 0
+        for sat in sats:
+            wanted_mask |= 1 << sat.value
+        with self.lock:
+            for sat in sats:
+                self._expire_dates((sat, area_type))
+            date_sats = self.AVAILABILITY.get(area_type, {})
+            for date_str in reversed(self.AVAILABLE_DATES.get(area_type, [])):
+                if date_sats[date_str] & wanted_mask == wanted_mask:
+                    return date_str
+        return None
+
     def set_cache_dates(self,
                         sat: Satellite,
                         area_type:AreaType,
-                        dates) -> dict:
-        if not sat in self.CACHE_DATES:
-            self.CACHE_DATES[sat] = {}
-        if not area_type in self.CACHE_DATES[sat]:
-            self.CACHE_DATES[sat][area_type] = []
-        self.CACHE_DATES[sat][area_type].extend(dates)
+                        dates):
+        key = (sat, area_type)
+        dates = sorted(set(dates))
+        with self.lock:
+            if key in self.CACHE_DATES:
+                self._set_available(sat, area_type, self.CACHE_DATES[key][1],
+                                    available=False)
+            self.CACHE_DATES[key] = (self.get_expiry(), dates)
+            self._set_available(sat, area_type, dates)
 
-class SnowPackData():
+    def merge_cache_dates(self,
+                          sat: Satellite,
+                          area_type:AreaType,
+                          dates) -> list:
+        """adds dates to the cached dates for the satellite / area type,
+        skipping any that are already cached.  The cached dates are kept in
+        sorted order by inserting the new dates in place.
+
+        :return: the dates that were not already cached
+        :rtype: list
+        """
+        key = (sat, area_type)
+        new_dates = []
+        with self.lock:
+            if key in self.CACHE_DATES:
+                _, cached_dates = self.CACHE_DATES[key]
+            else:
+                cached_dates = []
+            for date_str in dates:
+                insert_at = bisect.bisect_left(cached_dates, date_str)
+                if insert_at == len(cached_dates) or cached_dates[insert_at] != date_str:
+                    cached_dates.insert(insert_at, date_str)
+                    new_dates.append(date_str)
+            self.CACHE_DATES[key] = (self.get_expiry(), cached_dates)
+            self._set_available(sat, area_type, new_dates)
+        return new_dates
+
+    def get_expiry(self) -> float:
+        """returns the expiry time for an entry added now"""
+        if self.ttl is None:
+            return math.inf
+        return time.monotonic() + self.ttl
+
+    def get_all_cache(self) -> list:
+        """returns all the unexpired names in the cache
+
+        :return: list of tuples of (sat, area_type, date_str, file_names)
+        :rtype: list
+        """
+        now = time.monotonic()
+        file_names = self.area_names.file_names
+        with self.lock:
+            return [(*key, [file_names[area_id] for area_id in area_ids])
+                    for key, (expires, area_ids) in self.CACHE_DATA.items()
+                    if expires > now]
+
+    def get_all_cache_dates(self) -> list:
+        """returns all the unexpired dates in the cache
+
+        :return: list of tuples of (sat, area_type, dates)
+        :rtype: list
+        """
+        now = time.monotonic()
+        with self.lock:
+            return [(*key, sorted(dates)) for key, (expires, dates) in self.CACHE_DATES.items()
+                    if expires > now]
+
+    def get_stats(self) -> dict:
+        """returns the cache counters, ready to be logged or scraped
+
+        :return: dictionary with the keys hits, misses, hit_ratio,
+            evictions, expirations, entries and max_entries
+        :rtype: dict
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self.CACHE_DATA),
+                'max_entries': self.max_entries
+            }
+
+class Flight():
+    """a call in progress, that callers asking for the same key wait on"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """coalesces concurrent calls for the same key, ie the streamlit script
+    threads of several sessions missing the cache for the same date at the
+    same time.  The first caller for a key makes the call, the others wait
+    for it and share its result, or its exception.
+    """
     def __init__(self):
-        self.objstor = NRUtil.NRObjStoreUtil.ObjectStoreUtil()
+        self.lock = threading.Lock()
+        # key -> Flight
+        self.flights = {}
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """returns func(), or the result of the call to func already in
+        progress for key.  Callers sharing a result get a shallow copy of it.
+
+        :param key: hashable identifying the call
+        :param func: callable taking no arguments
+        :return: the result of func
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            LOGGER.debug(f"waiting on the call in progress for {key}")
+            metrics.METRICS.inc('snowpack_coalesced_calls_total',
+                                (('call', str(key[0])),))
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.copy(flight.result)
+
+        try:
+            flight.result = func()
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def is_in_flight(self, key) -> bool:
+        """returns True if a call for key is in progress"""
+        with self.lock:
+            return key in self.flights
+
+
+class CatalogRefresher(threading.Thread):
+    """daemon thread that periodically refreshes a SnowPackData catalog.
+
+    Plots are published once a day, so after a successful refresh the next
+    one is scheduled after `interval` seconds, unless yesterdays plots have
+    not yet shown up for every satellite, in which case it checks again
+    after `pending_interval` seconds.  Failed refreshes, including a failed
+    first load, are retried with an exponential backoff from
+    `retry_interval`, up to `max_backoff` seconds.  Refreshes are
+    incremental except once every `full_interval` seconds.
+    """
+    def __init__(self,
+                 snowpack_data: 'SnowPackData',
+                 snapshot_path: str=None,
+                 interval: float=constants.REFRESH_INTERVAL,
+                 pending_interval: float=constants.REFRESH_PENDING_INTERVAL,
+                 retry_interval: float=constants.REFRESH_RETRY_INTERVAL,
+                 max_backoff: float=constants.REFRESH_MAX_BACKOFF,
+                 full_interval: float=constants.REFRESH_FULL_INTERVAL,
+                 refresh_now: bool=False,
+                 failures: int=0):
+        """
+        :param snowpack_data: the catalog to refresh
+        :type snowpack_data: SnowPackData
+        :param snapshot_path: if provided a snapshot is written after each
+            refresh, defaults to None
+        :type snapshot_path: str, optional
+        :param interval: seconds between refreshes, defaults to
+            constants.REFRESH_INTERVAL
+        :type interval: float, optional
+        :param pending_interval: seconds between refreshes while the latest
+            expected date is missing, defaults to
+            constants.REFRESH_PENDING_INTERVAL
+        :type pending_interval: float, optional
+        :param retry_interval: seconds to wait after the first failed
+            refresh, doubling with each further failure, defaults to
+            constants.REFRESH_RETRY_INTERVAL
+        :type retry_interval: float, optional
+        :param max_backoff: maximum seconds to wait after a failed refresh,
+            defaults to constants.REFRESH_MAX_BACKOFF
+        :type max_backoff: float, optional
+        :param full_interval: refreshes list only the dates from the newest
+            cached date onwards, except every full_interval seconds when the
+            whole archive is re-listed, defaults to
+            constants.REFRESH_FULL_INTERVAL
+        :type full_interval: float, optional
+        :param refresh_now: when True the first refresh happens immediately,
+            otherwise after the first interval, defaults to False
+        :type refresh_now: bool, optional
+        :param failures: number of failed loads before the refresher was
+            started, ie 1 if the first load failed, so the first refresh is
+            a retry, defaults to 0
+        :type failures: int, optional
+        """
+        super().__init__(name='catalog-refresher', daemon=True)
+        self.snowpack_data = snowpack_data
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.pending_interval = pending_interval
+        self.retry_interval = retry_interval
+        self.max_backoff = max_backoff
+        self.refresh_now = refresh_now
+        self.full_interval = full_interval
+        # the initial data is either a full listing or a snapshot, either way
+        # it can be incrementally updated
+        self.last_full_refresh = time.monotonic()
+        self.full_refresh_requested = False
+        self.failures = failures
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+
+    def trigger(self, full: bool=True):
+        """wakes the thread up to refresh immediately
+
+        :param full: when True a full rather than an incremental refresh is
+            done, defaults to True
+        :type full: bool, optional
+        """
+        self.full_refresh_requested = full
+        self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def run(self):
+        delay = 0 if self.refresh_now else self.get_delay()
+        while not self.stop_event.is_set():
+            self.wake_event.wait(delay)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            # periodically do a full listing to pick up any dates or plots
+            # that have been removed / replaced
+            incremental = not self.full_refresh_requested and \
+                (time.monotonic() - self.last_full_refresh) < self.full_interval
+            self.full_refresh_requested = False
+            try:
+                self.snowpack_data.reload(snapshot_path=self.snapshot_path,
+                                          incremental=incremental)
+                if not incremental:
+                    self.last_full_refresh = time.monotonic()
+                self.failures = 0
+            except Exception:
+                self.failures += 1
+                LOGGER.exception(f"catalog refresh failed, failures: {self.failures}")
+            delay = self.get_delay()
+            LOGGER.debug(f"next catalog refresh in {delay:.0f}s")
+
+    def get_delay(self) -> float:
+        """returns the number of seconds to wait before the next refresh"""
+        if self.failures:
+            return min(self.max_backoff,
+                       self.retry_interval * (2 ** (self.failures - 1)))
+        if self.is_pending():
+            return self.pending_interval
+        return self.interval
+
+    def is_pending(self) -> bool:
+        """returns True if yesterdays plots haven't been found yet for every
+        satellite
+        """
+        expected_date = self.snowpack_data.get_date_strings(days_back=1)[0]
+        for sat_str in constants.SAT_OPTIONS:
+            dates = self.snowpack_data.cache.get_cache_dates(
+                sat=Satellite[sat_str],
+                area_type=AreaType[constants.WAT_BASIN_OPTIONS[0]])
+            if expected_date not in dates:
+                return True
+        return False
+
+
+class SnowPackData():
+    def __init__(self,
+                 ttl: int=constants.CATALOG_TTL,
+                 background_refresh: bool=False,
+                 manifest_object: str=constants.MANIFEST_OBJECT,
+                 max_entries: int=constants.CACHE_MAX_ENTRIES):
+        """
+        :param ttl: number of seconds cached dates / names are retained before
+            they are discarded and re-read from object storage, defaults to
+            constants.CATALOG_TTL
+        :type ttl: int, optional
+        :param background_refresh: when True the cache is kept up to date by
+            a CatalogRefresher (started by warm_start), cached data doesn't
+            expire and once the catalog has been loaded a cache miss returns
+            no data rather than calling object storage, defaults to False
+        :type background_refresh: bool, optional
+        :param manifest_object: object name of the catalog manifest written
+            by manifest.py, if set the catalog is read from the manifest
+            rather than listed, when it is available and current, defaults to
+            constants.MANIFEST_OBJECT
+        :type manifest_object: str, optional
+        :param max_entries: maximum number of satellite / area type / dates
+            held in the cache, defaults to constants.CACHE_MAX_ENTRIES
+        :type max_entries: int, optional
+        """
+        # shared by every SnowPackData in the process, reusing its connections
+        self.objstor = objstore_client.get_objstore_util()
         self.plotdir = 'plot'
         self.archive_dir = 'snowpack_archive'
-        self.cache = CacheData()
+        self.ttl = ttl
+        self.background_refresh = background_refresh
+        self.max_entries = max_entries
+        self.refresher = None
+        self.cache = self._new_cache()
         self.data_retrieved = False # marker to know if the data retrieval and
                                     # caching has been called
+        self.last_refresh = None    # time.time() of the last complete load
+        self.prefetch_timings = []  # timings from the last prefetch
+        # concurrent cache misses for the same data share one listing
+        self.single_flight = SingleFlight()
+        self.manifest_object = manifest_object
+        self.manifest_etag = None
+        self.manifest_created = None
+        self.http_session = objstore_client.make_session()
+
+    def _new_cache(self) -> CacheData:
+        ttl = None if self.background_refresh else self.ttl
+        return CacheData(max_entries=self.max_entries, ttl=ttl,
+                         url_prefix=self.get_url_prefix())
+
+    def get_url_prefix(self) -> str:
+        """returns the public url to the plot directory"""
+        return f'https://{NRUtil.constants.OBJ_STORE_HOST}/{NRUtil.constants.OBJ_STORE_BUCKET}/{self.get_plot_root()}'
+
+    def invalidate(self):
+        """discards everything that has been cached, the next request for
+        dates or names will go back to object storage.  If the cache is
+        being refreshed in the background, triggers an immediate refresh
+        instead, and the current data continues to be served until it
+        completes.
+        """
+        if self.refresher:
+            LOGGER.info("triggering a refresh of the snowpack data cache")
+            self.refresher.trigger()
+        else:
+            LOGGER.info("invalidating the snowpack data cache")
+            self.cache = self._new_cache()
+            self.data_retrieved = False
+
+    def get_stats(self) -> dict:
+        """returns the cache counters along with the age of the catalog
+
+        :return: the CacheData.get_stats() dictionary, plus the keys
+            coalesced, the number of calls that waited on another caller's
+            listing, and catalog_age_seconds, which is -1 if the catalog
+            hasn't been loaded
+        :rtype: dict
+        """
+        stats = self.cache.get_stats()
+        stats['coalesced'] = self.single_flight.coalesced
+        stats['catalog_age_seconds'] = -1
+        if self.last_refresh is not None:
+            stats['catalog_age_seconds'] = time.time() - self.last_refresh
+        return stats
+
+    def is_stale(self) -> bool:
+        """returns True if the data was retrieved longer than ttl seconds ago,
+        and it is not being refreshed in the background.
+        """
+        return not self.background_refresh and \
+            self.last_refresh is not None and \
+            (time.time() - self.last_refresh) > self.ttl
+
+    def is_offline(self) -> bool:
+        """returns True if cache misses should be answered without calling
+        object storage, ie the cache is refreshed in the background and has
+        been loaded.
+        """
+        return self.background_refresh and self.last_refresh is not None
 
-    def get_all_data(self):
+    @metrics.timed
+    def get_all_data(self, bulk_listing: bool=True):
         """loads and caches all the data from object store that will be required
         to display to various images.
+
+        :param bulk_listing: when True (default) the whole archive is indexed
+            with a single recursive listing (see build_index), otherwise the
+            dates / names are listed per satellite / area type / date
+            concurrently (see prefetch).
+        :type bulk_listing: bool, optional
         """
         if not self.data_retrieved:
+            self.single_flight.do(('all_data',),
+                                  lambda: self._load_all_data(bulk_listing))
+        elif self.is_stale():
+            # the stale catalog is served while it is reloaded
+            self._start_revalidate(lambda: self._load_all_data(bulk_listing))
+
+    def _load_all_data(self, bulk_listing: bool):
+        # another caller may have completed the load while this one waited
+        if self.data_retrieved and not self.is_stale():
+            return
+        if bulk_listing:
+            self.refresh()
+        else:
+            self.prefetch()
+        self.last_refresh = time.time()
+        self.data_retrieved = True
+
+    @metrics.timed
+    def prefetch(self,
+                 date_strings: list=None,
+                 max_workers: int=constants.PREFETCH_WORKERS,
+                 timeout: float=constants.PREFETCH_TIMEOUT) -> list:
+        """warms the cache by fanning the object store listings out over a
+        thread pool.  The dates for every satellite / area type are listed
+        first, then the names for every date in date_strings that exists.
+
+        A listing that fails or doesn't complete within `timeout` seconds of
+        starting is logged and recorded, the rest of the prefetch carries
+        on.
+
+        :param date_strings: the dates to retrieve names for, defaults to
+            the dates returned by get_date_strings()
+        :type date_strings: list, optional
+        :param max_workers: maximum number of listings that will be run
+            concurrently, defaults to constants.PREFETCH_WORKERS
+        :type max_workers: int, optional
+        :param timeout: number of seconds to wait for each listing, from
+            when it starts rather than when it is queued, defaults to
+            constants.PREFETCH_TIMEOUT
+        :type timeout: float, optional
+        :return: a list of dictionaries, one per listing, with the keys:
+            task, seconds, and error (None if the listing succeeded)
+        :rtype: list
+        """
+        if date_strings is None:
             date_strings = self.get_date_strings()
+        start = time.monotonic()
+        timings = []
+        # task key -> time.monotonic() when the listing started
+        started = {}
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='prefetch')
+        try:
+            date_tasks = {}
+            for sat_str in constants.SAT_OPTIONS:
+                for area_type_str in constants.WAT_BASIN_OPTIONS:
+                    sat = Satellite[sat_str]
+                    area_type = AreaType[area_type_str]
+                    date_tasks[(sat, area_type)] = executor.submit(
+                        self._timed_call, started, (sat, area_type),
+                        self.get_dates, sat=sat, area_type=area_type)
+            dates_exist = self._collect_prefetch(date_tasks, started, timeout, timings)
+
+            name_tasks = {}
+            for (sat, area_type), dates in dates_exist.items():
+                for date_string in date_strings:
+                    if date_string in dates:
+                        task_key = (sat, area_type, date_string)
+                        name_tasks[task_key] = executor.submit(
+                            self._timed_call, started, task_key, self.get_names,
+                            sat=sat, area_type=area_type, date_str=date_string)
+            self._collect_prefetch(name_tasks, started, timeout, timings)
+        finally:
+            # don't hold up the caller on listings that have timed out
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        failed = [timing for timing in timings if timing['error']]
+        slowest = max([timing['seconds'] for timing in timings], default=0)
+        LOGGER.info(f"prefetched {len(timings) - len(failed)} of {len(timings)} "
+                    f"listings in {time.monotonic() - start:.2f}s, slowest "
+                    f"listing: {slowest:.2f}s")
+        self.prefetch_timings = timings
+        return timings
+
+    def _timed_call(self, started: dict, task_key: tuple, func, **kwargs):
+        """runs func, recording when it started in started[task_key], and
+        returning a tuple of its result, the number of seconds it took, and
+        any exception that it raised.
+        """
+        start = started[task_key] = time.monotonic()
+        try:
+            return func(**kwargs), time.monotonic() - start, None
+        except Exception as err:
+            return None, time.monotonic() - start, err
+
+    def _collect_prefetch(self, tasks: dict, started: dict, timeout: float,
+                          timings: list) -> dict:
+        """waits for the futures in tasks to complete, each for up to timeout
+        seconds from when it started, appending a timing record for each
+        one to timings.  Listings still queued once nothing has started or
+        completed for timeout seconds, ie every worker is stuck on a listing
+        that timed out, are given up on.
+
+        :return: dictionary with the same keys as tasks, with the results of
+            the tasks that succeeded
+        :rtype: dict
+        """
+        pending = dict(tasks)
+        done = set()
+        # listings that have started, and when one last started or completed
+        seen = set()
+        last_progress = time.monotonic()
+        while pending:
+            now = time.monotonic()
+            running = {task_key: started[task_key] + timeout
+                       for task_key in pending if task_key in started}
+            if not seen.issuperset(running):
+                seen.update(running)
+                last_progress = now
+            expired = [task_key for task_key, deadline in running.items()
+                       if deadline <= now]
+            if not running and now - last_progress >= timeout:
+                # the workers are all stuck on listings that timed out
+                expired = list(pending)
+            for task_key in expired:
+                del pending[task_key]
+                running.pop(task_key, None)
+            if not pending:
+                break
+            wait_until = min(running.values(), default=last_progress + timeout)
+            completed, _ = concurrent.futures.wait(
+                pending.values(),
+                timeout=max(wait_until - now, 0.01),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            if completed:
+                last_progress = time.monotonic()
+                done.update(completed)
+                pending = {task_key: future for task_key, future in pending.items()
+                           if future not in completed}
+
+        results = {}
+        for task_key, future in tasks.items():
+            task_name = '/'.join([getattr(key, 'name', key) for key in task_key])
+            if future in done:
+                result, seconds, err = future.result()
+            else:
+                result, seconds, err = None, timeout, TimeoutError(
+                    f'listing not complete {timeout}s after it started')
+            if err:
+                LOGGER.warning(f"prefetch of {task_name} failed: {err}")
+            else:
+                results[task_key] = result
+            timings.append({'task': task_name, 'seconds': seconds, 'error': err})
+        return results
 
-            for date_string in date_strings:
-                for sat_str in constants.SAT_OPTIONS:
-                    for area_type_str in constants.WAT_BASIN_OPTIONS:
-                        sat = Satellite[sat_str]
-                        area_type = AreaType[area_type_str]
-                        dates_exist = self.get_dates(sat=sat, area_type=area_type)
-                        if date_string in dates_exist:
-                            LOGGER.info(f'getting data for sat={sat_str}, area_type={area_type_str}, {date_string}')
-                            self.get_names(sat=sat,
-                                        area_type=area_type,
-                                        date_str=date_string)
+    @metrics.timed
+    def warm_start(self, snapshot_path: str=constants.SNAPSHOT_PATH):
+        """populates the cache from the snapshot file if one exists, and then
+        refreshes it from object storage in a background thread
+        (stale-while-revalidate).  If there is no usable snapshot the data is
+        retrieved from object storage before returning.  Either way a new
+        snapshot is written once the data has been retrieved.
+
+        If background_refresh is enabled a CatalogRefresher is started to
+        keep refreshing the data after that.
+
+        :param snapshot_path: path to the snapshot file, if None no snapshot
+            is read or written, defaults to constants.SNAPSHOT_PATH
+        :type snapshot_path: str, optional
+        """
+        snapshot_loaded = bool(snapshot_path) and self.load_snapshot(snapshot_path)
+        if not snapshot_loaded:
+            self._revalidate(lambda: self.refresh(snapshot_path=snapshot_path))
+
+        if self.background_refresh:
+            self.refresher = CatalogRefresher(
+                snowpack_data=self,
+                snapshot_path=snapshot_path,
+                refresh_now=snapshot_loaded,
+                failures=0 if self.data_retrieved else 1)
+            self.refresher.start()
+        elif snapshot_loaded:
+            self._start_revalidate(lambda: self.refresh(snapshot_path=snapshot_path,
+                                                        incremental=True))
+
+    def _start_revalidate(self, func):
+        """reloads the catalog with func in a daemon thread, unless it is
+        already being reloaded
+        """
+        if self.single_flight.is_in_flight(('all_data',)):
+            return
+        threading.Thread(target=self._revalidate, args=(func,),
+                         name='catalog-revalidate', daemon=True).start()
+
+    def _revalidate(self, func):
+        """reloads the catalog with func, sharing any reload in progress, and
+        logs rather than raises if it fails
+        """
+        try:
+            self.single_flight.do(('all_data',), func)
+        except Exception:
+            LOGGER.exception("unable to refresh the snowpack data from object storage")
+
+    def reload(self, snapshot_path: str=None, incremental: bool=False):
+        """refreshes the catalog (see refresh), or if it is already being
+        reloaded waits for that reload instead
+        """
+        self.single_flight.do(('all_data',),
+                              lambda: self.refresh(snapshot_path=snapshot_path,
+                                                   incremental=incremental))
+
+    @metrics.timed
+    def refresh(self, snapshot_path: str=None, incremental: bool=False):
+        """re-reads the catalog from object storage into a new cache, and then
+        swaps it in place of the current cache, so readers see either the old
+        or the new data but never a partially loaded cache.
+
+        :param snapshot_path: if provided a snapshot of the new cache is
+            written to this path, defaults to None
+        :type snapshot_path: str, optional
+        :param incremental: when True only the dates from the newest cached
+            date onwards are listed and merged into the current cache (see
+            update_index).  Falls back to a full refresh if nothing is cached,
+            defaults to False.  Neither is used if the catalog can be read
+            from the manifest.
+        :type incremental: bool, optional
+        """
+        if self.manifest_object and self.load_manifest():
+            LOGGER.debug("refreshed from the manifest")
+        elif incremental and self.update_index():
+            LOGGER.debug("incremental refresh complete")
+        else:
+            new_cache = self._new_cache()
+            self.build_index(cache=new_cache)
+            self.cache = new_cache
         self.data_retrieved = True
+        self.last_refresh = time.time()
+        if snapshot_path:
+            self.save_snapshot(snapshot_path)
+
+    @metrics.timed
+    def save_snapshot(self, snapshot_path: str=constants.SNAPSHOT_PATH):
+        """writes the cached dates, and the area names for each
+        satellite / area type / date to a gzipped json file.  Only the image
+        file names are stored, the urls are re-created when the snapshot is
+        loaded.
+
+        :param snapshot_path: the file to write to, defaults to
+            constants.SNAPSHOT_PATH
+        :type snapshot_path: str, optional
+        """
+        snapshot = self.get_snapshot()
+        snapshot_dir = os.path.dirname(snapshot_path)
+        if snapshot_dir and not os.path.exists(snapshot_dir):
+            os.makedirs(snapshot_dir)
+        # write to a temp file and then move so a partially written snapshot
+        # can never be read
+        tmp_path = f'{snapshot_path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fh:
+            json.dump(snapshot, fh, separators=(',', ':'))
+        os.replace(tmp_path, snapshot_path)
+        LOGGER.info(f"wrote snapshot: {snapshot_path}")
+
+    def get_snapshot(self) -> dict:
+        """returns the cached dates, and the image file names for each
+        satellite / area type / date, in the form written by save_snapshot
+
+        :return: dictionary with the keys version, created, dates
+            ({'<sat>/<area_type>': [date_str, ...]}) and names
+            ({'<sat>/<area_type>': {date_str: [file_name, ...]}})
+        :rtype: dict
+        """
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'created': time.time(),
+            'dates': {},
+            'names': {}
+        }
+        for sat, area_type, dates in self.cache.get_all_cache_dates():
+            snapshot['dates'][f'{sat.name}/{area_type.name}'] = dates
+        for sat, area_type, date_str, file_names in self.cache.get_all_cache():
+            combo = snapshot['names'].setdefault(f'{sat.name}/{area_type.name}', {})
+            combo[date_str] = file_names
+        return snapshot
+
+    def set_snapshot(self,
+                     snapshot: dict,
+                     source: str,
+                     cache: CacheData=None,
+                     max_age: int=constants.SNAPSHOT_MAX_AGE) -> bool:
+        """populates a cache from a snapshot returned by get_snapshot
+
+        :param snapshot: the snapshot
+        :type snapshot: dict
+        :param source: where the snapshot came from, for logging
+        :type source: str
+        :param cache: the cache to populate, defaults to this objects cache
+        :type cache: CacheData, optional
+        :param max_age: snapshots older than this number of seconds are
+            ignored, defaults to constants.SNAPSHOT_MAX_AGE
+        :type max_age: int, optional
+        :return: True if the snapshot was loaded
+        :rtype: bool
+        """
+        if cache is None:
+            cache = self.cache
+        snapshot_age = time.time() - snapshot.get('created', 0)
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot_age > max_age:
+            LOGGER.info(f"ignoring snapshot {source}, version: "
+                        f"{snapshot.get('version')} age: {snapshot_age:.0f}s")
+            return False
+
+        for combo, dates in snapshot['dates'].items():
+            sat_str, area_type_str = combo.split('/')
+            cache.set_cache_dates(sat=Satellite[sat_str],
+                                  area_type=AreaType[area_type_str],
+                                  dates=dates)
+        # the names are cached oldest date first across every combination,
+        # as in build_index, so a snapshot holding more dates than the cache
+        # does leaves the cache with the newest dates of every combination
+        date_combos = []
+        for combo, date_files in snapshot['names'].items():
+            sat_str, area_type_str = combo.split('/')
+            sat = Satellite[sat_str]
+            area_type = AreaType[area_type_str]
+            for date_str in date_files:
+                date_combos.append((date_str, sat.value, area_type.value, sat, area_type, combo))
+        date_combos.sort()
+        for date_str, _, _, sat, area_type, combo in date_combos[-cache.max_entries:]:
+            cache.set_cache(sat=sat, area_type=area_type, date_str=date_str,
+                            file_names=snapshot['names'][combo][date_str])
+        self.last_refresh = snapshot['created']
+        if cache is self.cache:
+            # the snapshot is served until it is revalidated, rather than
+            # the first page request listing the archive
+            self.data_retrieved = True
+        LOGGER.info(f"loaded snapshot {source}, age: {snapshot_age:.0f}s")
+        return True
+
+    @metrics.timed
+    def load_snapshot(self,
+                      snapshot_path: str=constants.SNAPSHOT_PATH,
+                      max_age: int=constants.SNAPSHOT_MAX_AGE) -> bool:
+        """populates the cache from a snapshot written by save_snapshot
+
+        :param snapshot_path: the file to read, defaults to
+            constants.SNAPSHOT_PATH
+        :type snapshot_path: str, optional
+        :param max_age: snapshots older than this number of seconds are
+            ignored, defaults to constants.SNAPSHOT_MAX_AGE
+        :type max_age: int, optional
+        :return: True if the snapshot was loaded
+        :rtype: bool
+        """
+        if not os.path.exists(snapshot_path):
+            LOGGER.info(f"no snapshot found at: {snapshot_path}")
+            return False
+        try:
+            with gzip.open(snapshot_path, 'rt', encoding='utf-8') as fh:
+                snapshot = json.load(fh)
+        except (OSError, ValueError) as err:
+            LOGGER.warning(f"unable to read snapshot {snapshot_path}: {err}")
+            return False
+        return self.set_snapshot(snapshot, source=snapshot_path, max_age=max_age)
+
+    @metrics.timed
+    def load_manifest(self, max_age: int=constants.MANIFEST_MAX_AGE) -> bool:
+        """replaces the cache with the catalog in the manifest published to
+        object storage by manifest.py, a single GET rather than listing the
+        archive.  The manifest is only downloaded again once it has changed
+        (If-None-Match).
+
+        :param max_age: manifests older than this number of seconds are
+            ignored, so the archive is listed if the manifest stops being
+            published, defaults to constants.MANIFEST_MAX_AGE
+        :type max_age: int, optional
+        :return: True if the cache holds the current manifest
+        :rtype: bool
+        """
+        manifest_url = self.get_manifest_url()
+        headers = {}
+        if self.manifest_etag:
+            headers['If-None-Match'] = self.manifest_etag
+        try:
+            with metrics.METRICS.objstore_request('get_manifest'):
+                resp = self.http_session.get(manifest_url, headers=headers,
+                                             timeout=constants.OBJSTORE_READ_TIMEOUT)
+            if resp.status_code == 304:
+                manifest_age = time.time() - self.manifest_created
+                LOGGER.debug(f"manifest not modified, age: {manifest_age:.0f}s")
+                return manifest_age <= max_age
+            resp.raise_for_status()
+            snapshot = json.loads(gzip.decompress(resp.content))
+        except (requests.RequestException, OSError, ValueError) as err:
+            LOGGER.warning(f"unable to read the manifest {manifest_url}: {err}")
+            return False
+
+        new_cache = self._new_cache()
+        if not self.set_snapshot(snapshot, source=manifest_url, cache=new_cache,
+                                 max_age=max_age):
+            return False
+        self.cache = new_cache
+        self.manifest_etag = resp.headers.get('ETag')
+        self.manifest_created = snapshot['created']
+        return True
+
+    def get_manifest_url(self) -> str:
+        """returns the public url to the manifest"""
+        return f'https://{NRUtil.constants.OBJ_STORE_HOST}/{NRUtil.constants.OBJ_STORE_BUCKET}/{self.manifest_object}'
+
+    @metrics.timed
+    def build_index(self, cache: CacheData=None):
+        """populates the cache with the dates and names for every satellite /
+        area type combination using a single recursive listing of
+        snowpack_archive/plot/, instead of a listing per satellite and per
+        satellite / area type / date.
+
+        Names are written to the cache oldest date first, so if the archive
+        holds more dates than the cache can retain it is the oldest that get
+        evicted.
+
+        :param cache: the cache to populate, defaults to this objects cache
+        :type cache: CacheData, optional
+        """
+        if cache is None:
+            cache = self.cache
+        plot_root = self.get_plot_root()
+        with metrics.METRICS.objstore_request('list_objects'):
+            obj_list = self.objstor.list_objects(objstore_dir=plot_root, recursive=True, return_file_names_only=True)
+
+        # (sat, area_type) -> date_str -> list of object names
+        index = {}
+        obj_cnt = 0
+        for cur_obj in obj_list:
+            parsed = self.parse_object_name(cur_obj)
+            if parsed is None:
+                LOGGER.debug(f"skipping unexpected object: {cur_obj}")
+                continue
+            sat, area_type, date_str = parsed
+            index.setdefault((sat, area_type), {}).setdefault(date_str, []).append(cur_obj)
+            obj_cnt += 1
+        LOGGER.info(f"indexed {obj_cnt} objects under {plot_root}")
+
+        date_combos = []
+        for (sat, area_type), date_objs in index.items():
+            cache.set_cache_dates(sat=sat, area_type=area_type, dates=sorted(date_objs))
+            for date_str in date_objs:
+                date_combos.append((date_str, sat.value, area_type.value, sat, area_type))
+        date_combos.sort()
+        for date_str, _, _, sat, area_type in date_combos:
+            file_names = [os.path.basename(cur_obj) for cur_obj in index[(sat, area_type)][date_str]]
+            cache.set_cache(sat=sat, area_type=area_type, date_str=date_str,
+                            file_names=file_names)
+
+    @metrics.timed
+    def update_index(self) -> bool:
+        """adds any dates published since the newest cached date to the
+        cache.  For every satellite / area type, lists the objects that sort
+        after the newest cached date, which includes the newest date itself
+        in case it was still being published when it was last listed.
+
+        :return: False if there are no cached dates for a satellite / area
+            type to list from, in which case a full build_index is required
+        :rtype: bool
+        """
+        cache = self.cache
+        combos = []
+        for sat_str in constants.SAT_OPTIONS:
+            for area_type_str in constants.WAT_BASIN_OPTIONS:
+                sat = Satellite[sat_str]
+                area_type = AreaType[area_type_str]
+                cached_dates = cache.get_cache_dates(sat=sat, area_type=area_type)
+                if not cached_dates:
+                    return False
+                combos.append((sat, area_type, cached_dates[-1]))
+
+        for sat, area_type, newest_date in combos:
+            plot_dir = self.get_plot_dir(sat=sat, area_type=area_type)
+            obj_list = self.list_objects_after(
+                objstore_dir=plot_dir,
+                start_after=f'{plot_dir}{newest_date}')
+            date_objs = {}
+            for cur_obj in obj_list:
+                parsed = self.parse_object_name(cur_obj)
+                if parsed is not None:
+                    date_objs.setdefault(parsed[2], []).append(cur_obj)
+            new_dates = cache.merge_cache_dates(sat=sat, area_type=area_type,
+                                                dates=sorted(date_objs))
+            LOGGER.info(f"new dates for {sat.name}/{area_type.name}: {new_dates}")
+            for date_str in sorted(date_objs):
+                file_names = [os.path.basename(cur_obj) for cur_obj in date_objs[date_str]]
+                cache.set_cache(sat=sat, area_type=area_type, date_str=date_str,
+                                file_names=file_names)
+        return True
+
+    def list_objects_after(self,
+                           objstore_dir: str,
+                           start_after: str,
+                           recursive: bool=True) -> list:
+        """lists the object names under objstore_dir that sort after
+        start_after.
+
+        :param objstore_dir: the prefix to list
+        :type objstore_dir: str
+        :param start_after: only object names greater than this are returned,
+            if None every object under objstore_dir is returned
+        :type start_after: str
+        :param recursive: list recursively, defaults to True
+        :type recursive: bool, optional
+        :return: list of object names
+        :rtype: list
+        """
+        with metrics.METRICS.objstore_request('list_objects'):
+            objects = self.objstor.minio_client.list_objects(
+                self.objstor.obj_store_bucket,
+                prefix=objstore_dir,
+                recursive=recursive,
+                start_after=start_after,
+                use_url_encoding_type=False)
+            return [obj.object_name for obj in objects]
+
+    def parse_object_name(self, object_name: str):
+        """parses an object name from the plot archive,
+        snowpack_archive/plot/<sat>/<area_type>/<date_str>/<area_name>.png into
+        its satellite, area type and date string.
 
-    def get_date_strings(self, days_back=10) -> list[str]:
+        :param object_name: object name, as returned by a listing
+        :type object_name: str
+        :return: tuple of (Satellite, AreaType, date_str), or None if the
+            object name does not fit the archive structure
+        :rtype: tuple
+        """
+        plot_root = self.get_plot_root()
+        if not object_name.startswith(plot_root):
+            return None
+        path_parts = object_name[len(plot_root):].split('/')
+        if len(path_parts) != 4 or not path_parts[3]:
+            return None
+        sat_str, area_type_str, date_str, _ = path_parts
+        if sat_str not in Satellite.__members__ or \
+                area_type_str not in AreaType.__members__ or \
+                not DATE_PATTERN.fullmatch(date_str):
+            return None
+        return Satellite[sat_str], AreaType[area_type_str], date_str
+
+    def get_name_url_dict(self, obj_list: list) -> dict:
+        """converts a list of object names into a dictionary of area name /
+        url.  Area names are the file name without the suffix and with any
+        '_' replaced by spaces
+
+        :param obj_list: list of object names
+        :type obj_list: list
+        :return: dictionary with area names as the keys and url's to the
+            image as the values
+        :rtype: dict
+        """
+        names_list = {}
+        for cur_obj in obj_list:
+            file_name = os.path.basename(cur_obj)
+            file_name_no_suffix = os.path.splitext(file_name)[0]
+            file_name_spaces = file_name_no_suffix.replace("_", " ")
+            obj_store_url = f'https://{NRUtil.constants.OBJ_STORE_HOST}/{NRUtil.constants.OBJ_STORE_BUCKET}/{cur_obj}'
+            names_list[file_name_spaces] = obj_store_url
+        return names_list
+
+    def get_date_strings(self, days_back=constants.DAYS_BACK) -> list[str]:
         """creates a list of date strings in the form 'YYYY.MM.DD'.  By
-        default generates 10, but that is a configurable option.
+        default generates constants.DAYS_BACK, but that is a configurable
+        option.
 
         :return: a list of strings containing date strings from yesterday back
             'days_back' number of days
@@ -144,11 +1523,11 @@ class SnowPackData():
             date_str_list.append(date_str)
         return date_str_list
 
+    @metrics.timed
     def get_names(self,
                   sat: Satellite=Satellite.modis,
                   area_type:AreaType=AreaType.watersheds,
-                  date_str=None,
-                  publish=False
+                  date_str=None
     ):
         """For a given satellite / area_type / date_str, will return a
         dictionary, where the keys are the area_type names, and the values
@@ -179,10 +1558,30 @@ class SnowPackData():
 
         cache_data = self.cache.get_cache(sat=sat, area_type=area_type, date_str=date_str)
 
-        if not cache_data:
+        if cache_data is None and self.is_offline():
+            LOGGER.debug(f"no cached names for {sat.name}/{area_type.name}/{date_str}")
+            cache_data = {}
+        elif cache_data is None:
+            cache_data = self.single_flight.do(
+                ('names', sat, area_type, date_str),
+                lambda: self._list_names(sat=sat, area_type=area_type,
+                                         date_str=date_str))
+        return cache_data
 
+    def _list_names(self,
+                    sat: Satellite,
+                    area_type: AreaType,
+                    date_str: str) -> dict:
+        """lists the names for a satellite / area type / date from object
+        storage and caches them, see get_names
+        """
+        # the names may have been cached while waiting on another listing
+        cache_data = self.cache.get_cache(sat=sat, area_type=area_type,
+                                          date_str=date_str)
+        if cache_data is None:
             plot_dir = self.get_plot_dir(sat=sat, area_type=area_type, date_str=date_str)
-            obj_list = self.objstor.list_objects(objstore_dir=plot_dir, recursive=False, return_file_names_only=True)
+            with metrics.METRICS.objstore_request('list_objects'):
+                obj_list = self.objstor.list_objects(objstore_dir=plot_dir, recursive=False, return_file_names_only=True)
 
             # https://nrs.objectstore.gov.bc.ca/qamxjr/snowpack_archive/plot/modis/basins/2023.03.20/ASHNOLA_RIVER_NEAR_KEREMEOS.png
             #
@@ -192,36 +1591,83 @@ class SnowPackData():
 
             # finally pull just the file name out of the obj_list and remove
             # any suffix, finally replace any _ with spaces
-            names_list = {}
-            for cur_obj in obj_list:
-                file_name = os.path.basename(cur_obj)
-                file_name_no_suffix = os.path.splitext(file_name)[0]
-                file_name_spaces = file_name_no_suffix.replace("_", " ")
-                obj_store_url = f'https://{NRUtil.constants.OBJ_STORE_HOST}/{NRUtil.constants.OBJ_STORE_BUCKET}/{cur_obj}'
-                names_list[file_name_spaces] = obj_store_url
-
-                # todo: this should later get removed and be part of the upload
-                #       scripts
-                if publish:
-                    self.objstor.set_public_permissions(object_name=cur_obj)
+            names_list = self.get_name_url_dict(obj_list)
             self.cache.set_cache(sat=sat, area_type=area_type, date_str=date_str,
-                                 data=names_list)
+                                 file_names=[os.path.basename(cur_obj) for cur_obj in obj_list])
             cache_data = names_list
         return cache_data
 
+    def list_plot_objects(self,
+                          sats: list=None,
+                          area_types: list=None,
+                          start_date: str=None,
+                          end_date: str=None) -> list:
+        """lists the plot object names for the satellites / area types
+        between start_date and end_date (inclusive), the plots published by
+        publish.py.  Listing starts at start_date rather than at the start
+        of the archive.
+
+        :return: list of object names
+        :rtype: list
+        """
+        if sats is None:
+            sats = [Satellite[sat_str] for sat_str in constants.SAT_OPTIONS]
+        if area_types is None:
+            area_types = [AreaType[area_type_str] for area_type_str in constants.WAT_BASIN_OPTIONS]
+        object_names = []
+        for sat in sats:
+            for area_type in area_types:
+                plot_dir = self.get_plot_dir(sat=sat, area_type=area_type)
+                start_after = f'{plot_dir}{start_date}' if start_date else None
+                for object_name in self.list_objects_after(objstore_dir=plot_dir,
+                                                           start_after=start_after):
+                    parsed = self.parse_object_name(object_name)
+                    if parsed is None:
+                        continue
+                    if end_date and parsed[2] > end_date:
+                        break
+                    object_names.append(object_name)
+        return object_names
+
+    @metrics.timed
     def get_dates(self,
                   sat: Satellite=Satellite.modis,
                   area_type:AreaType=AreaType.watersheds,
                   number_of_dates: int=constants.DAYS_BACK
                 ):
+        """returns the dates that images are available for, for a satellite /
+        area type, oldest first.
+
+        :param number_of_dates: the number of most recent dates to return, if
+            None returns all the dates, defaults to constants.DAYS_BACK
+        :type number_of_dates: int, optional
+        :return: list of date strings, format 'YYYY.MM.DD'
+        :rtype: list
+        """
         cached_dates = self.cache.get_cache_dates(sat=sat, area_type=area_type)
 
         LOGGER.debug(f"cached dates: {cached_dates}")
+        if not cached_dates and not self.is_offline():
+            cached_dates = self.single_flight.do(
+                ('dates', sat, area_type),
+                lambda: self._list_dates(sat=sat, area_type=area_type))
+        if cached_dates and number_of_dates is not None:
+            # the cached dates are sorted, so the latest are at the end
+            cached_dates = cached_dates[-number_of_dates:]
+        return cached_dates
+
+    def _list_dates(self, sat: Satellite, area_type: AreaType) -> list:
+        """lists the dates for a satellite / area type from object storage
+        and caches them, see get_dates
+        """
+        # the dates may have been cached while waiting on another listing
+        cached_dates = self.cache.get_cache_dates(sat=sat, area_type=area_type)
         if not cached_dates:
-            plot_dir = self.get_plot_dir(sat=sat)
+            plot_dir = self.get_plot_dir(sat=sat, area_type=area_type)
             #  objstore_dir=None, recursive=True, return_file_names_only=False
 
-            obj_list = self.objstor.list_objects(objstore_dir=plot_dir, recursive=False, return_file_names_only=True)
+            with metrics.METRICS.objstore_request('list_objects'):
+                obj_list = self.objstor.list_objects(objstore_dir=plot_dir, recursive=False, return_file_names_only=True)
             LOGGER.debug(f"obj_list: {obj_list}")
 
             # strip off the trailing '/' character and create a list of only
@@ -230,19 +1676,44 @@ class SnowPackData():
             for cur_date in obj_list:
                 if cur_date[-1] == '/':
                     cur_date = cur_date[:-1]
-                dates.append(os.path.basename(cur_date))
+                cur_date = os.path.basename(cur_date)
+                if DATE_PATTERN.fullmatch(cur_date):
+                    dates.append(cur_date)
 
-            cached_dates = dates
-            self.cache.set_cache_dates(sat=sat, area_type=area_type, dates=cached_dates)
+            self.cache.set_cache_dates(sat=sat, area_type=area_type, dates=dates)
+            cached_dates = self.cache.get_cache_dates(sat=sat, area_type=area_type)
 
             LOGGER.debug(f"dates: {dates}")
-        if cached_dates:
-            cached_dates.sort(reverse=True)
-            # trim to latest 5 then revert to ascending sort
-            cached_dates = cached_dates[0:number_of_dates]
-            cached_dates.sort()
         return cached_dates
 
+    @metrics.timed
+    def get_dates_between(self,
+                          start_date: str,
+                          end_date: str,
+                          sat: Satellite=Satellite.modis,
+                          area_type:AreaType=AreaType.watersheds) -> list:
+        """returns the dates that images are available for between start_date
+        and end_date (inclusive), oldest first.
+
+        :param start_date: first date, format 'YYYY.MM.DD'
+        :type start_date: str
+        :param end_date: last date, format 'YYYY.MM.DD'
+        :type end_date: str
+        :return: list of date strings, format 'YYYY.MM.DD'
+        :rtype: list
+        """
+        cached_dates = self.get_dates(sat=sat, area_type=area_type,
+                                      number_of_dates=None)
+        start = bisect.bisect_left(cached_dates, start_date)
+        end = bisect.bisect_right(cached_dates, end_date)
+        return cached_dates[start:end]
+
+    def get_plot_root(self) -> str:
+        """returns the object store directory that all the plots are archived
+        under, ie: 'snowpack_archive/plot/'
+        """
+        return f'{self.archive_dir}/{self.plotdir}/'
+
     def get_plot_dir(self,
                      sat: Satellite=Satellite.modis,
                      area_type:AreaType=AreaType.watersheds,
@@ -271,6 +1742,7 @@ class SnowPackData():
         LOGGER.debug(f"plot_dir: {plot_dir}")
         return plot_dir
 
+    @metrics.timed
     def get_url_by_date(self,
                          date_str:str,
                          area_name:str,
@@ -299,6 +1771,237 @@ class SnowPackData():
                 url = names[area_name]
         return url
 
+    @metrics.timed
+    def get_area_history(self,
+                         area_name: str,
+                         area_type: AreaType=AreaType.watersheds,
+                         start_date: str=None,
+                         end_date: str=None) -> list:
+        """returns every image available for an area across all the cached
+        dates and satellites, in a single lookup.  Loads the data first if it
+        hasn't been retrieved.
+
+        :param area_name: the name of the watershed / basin
+        :type area_name: str
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :param start_date: if provided only dates on or after this date are
+            returned, format 'YYYY.MM.DD', defaults to None
+        :type start_date: str, optional
+        :param end_date: if provided only dates on or before this date are
+            returned, format 'YYYY.MM.DD', defaults to None
+        :type end_date: str, optional
+        :return: list of tuples of (date_str, Satellite, url), sorted by date
+        :rtype: list
+        """
+        if not self.data_retrieved or self.is_stale():
+            self.get_all_data()
+        return self.cache.get_area_history(area_type=area_type,
+                                           area_name=area_name,
+                                           start_date=start_date,
+                                           end_date=end_date)
+
+    @metrics.timed
+    def get_url_matrix(self,
+                       area_name: str,
+                       dates: list,
+                       sats: list=None,
+                       area_type: AreaType=AreaType.watersheds) -> dict:
+        """returns the urls for an area for every combination of the
+        satellites and dates, in one lookup of the catalog rather than a
+        get_url_by_date per date / satellite.  Loads the data first if it
+        hasn't been retrieved.
+
+        :param area_name: the name of the watershed / basin
+        :type area_name: str
+        :param dates: list of date strings, format 'YYYY.MM.DD'
+        :type dates: list
+        :param sats: list of Satellite, defaults to None, all satellites
+        :type sats: list, optional
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :return: dictionary of date_str -> Satellite -> url, in the order of
+            dates / sats, the url is None if there is no image for the
+            date / satellite
+        :rtype: dict
+        """
+        if sats is None:
+            sats = [Satellite[sat_str] for sat_str in constants.SAT_OPTIONS]
+        if not self.data_retrieved or self.is_stale():
+            self.get_all_data()
+        return self.cache.get_url_matrix(area_type=area_type,
+                                         area_name=area_name,
+                                         sats=sats,
+                                         dates=dates)
+
+    @metrics.timed
+    def get_name_index(self,
+                       area_type: AreaType=AreaType.watersheds,
+                       date_str: str=None,
+                       sats: list=None) -> AreaNameIndex:
+        """returns the index over the area names for an area type / date,
+        listing the names first if they aren't cached.
+
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :param date_str: the date, format 'YYYY.MM.DD', defaults to None, the
+            newest date that every one of the satellites has.  The newest
+            date that any satellite has may still be being published, and
+            missing areas.
+        :type date_str: str, optional
+        :param sats: list of Satellite used to choose the date, defaults to
+            None, all satellites
+        :type sats: list, optional
+        :return: the index, empty if there are no names for the date
+        :rtype: AreaNameIndex
+        """
+        if sats is None:
+            sats = list(Satellite)
+        if date_str is None:
+            date_str = self.get_latest_common_date(sats=sats, area_type=area_type)
+        if date_str is None:
+            # the satellites have no date in common
+            dates = self.get_available_dates(sats=sats, area_type=area_type,
+                                             number_of_dates=1)
+            if not dates:
+                return AreaNameIndex(self.cache.area_names, ())
+            date_str = dates[-1]
+        name_index = self.cache.get_name_index(area_type=area_type, date_str=date_str)
+        if name_index is None:
+            for sat in self.get_available_sats(date_str=date_str, area_type=area_type):
+                self.get_names(sat=sat, area_type=area_type, date_str=date_str)
+            name_index = self.cache.get_name_index(area_type=area_type, date_str=date_str)
+        if name_index is None:
+            name_index = AreaNameIndex(self.cache.area_names, ())
+        return name_index
+
+    def get_area_names(self,
+                       area_type: AreaType=AreaType.watersheds,
+                       date_str: str=None,
+                       sats: list=None) -> list:
+        """returns the sorted display names of the areas for an area type /
+        date, see get_name_index
+        """
+        return self.get_name_index(area_type=area_type, date_str=date_str,
+                                   sats=sats).get_names()
+
+    def search_area_names(self,
+                          query: str,
+                          area_type: AreaType=AreaType.watersheds,
+                          date_str: str=None,
+                          sats: list=None,
+                          limit: int=constants.AREA_SEARCH_LIMIT) -> list:
+        """returns up to `limit` area names matching query, see
+        AreaNameIndex.search and get_name_index
+        """
+        return self.get_name_index(area_type=area_type, date_str=date_str,
+                                   sats=sats).search(query, limit=limit)
+
+    def _load_dates(self, sats: list, area_type: AreaType):
+        # makes sure the dates are cached, the availability is maintained
+        # alongside them
+        for sat in sats:
+            self.get_dates(sat=sat, area_type=area_type, number_of_dates=None)
+
+    @metrics.timed
+    def get_available_sats(self,
+                           date_str: str,
+                           area_type: AreaType=AreaType.watersheds) -> list:
+        """returns the satellites that have images for a date, ie VIIRS
+        images are usually published after the MODIS images.
+
+        :param date_str: the date, format 'YYYY.MM.DD'
+        :type date_str: str
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :return: list of Satellite
+        :rtype: list
+        """
+        self._load_dates(sats=list(Satellite), area_type=area_type)
+        return self.cache.get_available_sats(area_type=area_type, date_str=date_str)
+
+    @metrics.timed
+    def get_available_dates(self,
+                            sats: list=None,
+                            area_type: AreaType=AreaType.watersheds,
+                            number_of_dates: int=constants.DAYS_BACK,
+                            require_all: bool=False) -> list:
+        """returns the dates that any of the satellites have images for,
+        oldest first.
+
+        :param sats: list of Satellite, defaults to None, all satellites
+        :type sats: list, optional
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :param number_of_dates: the number of most recent dates to return, if
+            None returns all the dates, defaults to constants.DAYS_BACK
+        :type number_of_dates: int, optional
+        :param require_all: only return the dates that every satellite has
+            images for, defaults to False
+        :type require_all: bool, optional
+        :return: list of date strings, format 'YYYY.MM.DD'
+        :rtype: list
+        """
+        if sats is None:
+            sats = list(Satellite)
+        self._load_dates(sats=sats, area_type=area_type)
+        dates = self.cache.get_available_dates(area_type=area_type, sats=sats,
+                                               require_all=require_all)
+        if number_of_dates is not None:
+            dates = dates[-number_of_dates:]
+        return dates
+
+    @metrics.timed
+    def get_latest_common_date(self,
+                               sats: list=None,
+                               area_type: AreaType=AreaType.watersheds) -> str:
+        """returns the newest date that every one of the satellites has
+        images for
+
+        :param sats: list of Satellite, defaults to None, all satellites
+        :type sats: list, optional
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :return: date string, format 'YYYY.MM.DD', or None if the satellites
+            have no date in common
+        :rtype: str
+        """
+        if sats is None:
+            sats = list(Satellite)
+        self._load_dates(sats=sats, area_type=area_type)
+        return self.cache.get_latest_common_date(area_type=area_type, sats=sats)
+
+    @metrics.timed
+    def get_same_date_history(self,
+                              date_str: str,
+                              area_name: str,
+                              area_type: AreaType=AreaType.watersheds,
+                              years_back: int=constants.YEARS_BACK) -> list:
+        """returns the images for an area for the same day / month in
+        previous years, ie for comparing this season to earlier ones.
+
+        :param date_str: the date to compare, format 'YYYY.MM.DD'
+        :type date_str: str
+        :param area_name: the name of the watershed / basin
+        :type area_name: str
+        :param area_type: the area type, defaults to AreaType.watersheds
+        :type area_type: AreaType, optional
+        :param years_back: number of previous years to look for, defaults to
+            constants.YEARS_BACK
+        :type years_back: int, optional
+        :return: list of tuples of (date_str, Satellite, url), newest first,
+            starting with date_str itself
+        :rtype: list
+        """
+        year, month_day = date_str.split('.', 1)
+        same_dates = []
+        for cur_year in range(int(year), int(year) - years_back - 1, -1):
+            cur_date = f'{cur_year:04d}.{month_day}'
+            same_dates.extend(self.get_area_history(area_name=area_name,
+                                                    area_type=area_type,
+                                                    start_date=cur_date,
+                                                    end_date=cur_date))
+        return same_dates
 
 if __name__ == '__main__':
 
@@ -322,16 +2025,7 @@ if __name__ == '__main__':
 
     spd = SnowPackData()
 
-    # hacking - publish of data
-    sat = Satellite['viirs']
-    area_type = AreaType['watersheds']
-    names_dict = spd.get_names(sat=sat,
-                               area_type=area_type,
-                               date_str='2023.03.23',
-                               publish=True)
-    import sys
-    sys.exit()
-
+    # publishing is done by publish.py
     spd.get_all_data()
 
     dates = spd.get_dates()
@@ -0,0 +1,377 @@
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import PIL.Image
+import requests
+
+import constants
+import metrics
+import objstore_client
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CachedImage():
+    """the bytes for an image, with what is required to revalidate them"""
+    def __init__(self, content: bytes, etag: str=None, checked: float=None):
+        """
+        :param content: the image bytes
+        :type content: bytes
+        :param etag: the ETag returned by object storage with the image
+        :type etag: str, optional
+        :param checked: time.time() when the image was last fetched or
+            revalidated, defaults to now
+        :type checked: float, optional
+        """
+        self.content = content
+        self.etag = etag
+        self.checked = checked if checked is not None else time.time()
+
+
+class ImageCache():
+    """serves the snowpack plot images from memory / local disk rather than
+    having every browser fetch them from object storage.
+
+    Images are held in a least recently used memory cache limited to
+    `memory_budget` bytes, and optionally on disk limited to `disk_budget`
+    bytes.  The dated plots don't change once published, so an image is
+    only revalidated against object storage (If-None-Match with the ETag it
+    was fetched with) once it is older than `max_age` seconds.
+    """
+    def __init__(self,
+                 cache_dir: str=constants.IMAGE_CACHE_DIR,
+                 memory_budget: int=constants.IMAGE_CACHE_MEMORY_BYTES,
+                 disk_budget: int=constants.IMAGE_CACHE_DISK_BYTES,
+                 max_age: int=constants.IMAGE_MAX_AGE,
+                 timeout: float=constants.IMAGE_FETCH_TIMEOUT,
+                 workers: int=constants.IMAGE_FETCH_WORKERS):
+        """
+        :param cache_dir: directory to cache images in, if None images are
+            only cached in memory, defaults to constants.IMAGE_CACHE_DIR
+        :type cache_dir: str, optional
+        :param memory_budget: maximum bytes of images held in memory, defaults
+            to constants.IMAGE_CACHE_MEMORY_BYTES
+        :type memory_budget: int, optional
+        :param disk_budget: maximum bytes of images written to cache_dir,
+            defaults to constants.IMAGE_CACHE_DISK_BYTES
+        :type disk_budget: int, optional
+        :param max_age: seconds before a cached image is revalidated, defaults
+            to constants.IMAGE_MAX_AGE
+        :type max_age: int, optional
+        :param timeout: seconds to wait on object storage, defaults to
+            constants.IMAGE_FETCH_TIMEOUT
+        :type timeout: float, optional
+        :param workers: number of images get_renditions fetches / scales
+            concurrently, defaults to constants.IMAGE_FETCH_WORKERS
+        :type workers: int, optional
+        """
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.max_age = max_age
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        # url -> CachedImage
+        self.memory = collections.OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.session = objstore_client.make_session()
+        # shared by every session, the threads are only started when needed
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='image-cache')
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # partly written files left by a previous process
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith('.tmp'):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+            self.disk_bytes = sum(
+                os.path.getsize(os.path.join(self.cache_dir, file_name))
+                for file_name in os.listdir(self.cache_dir)
+                if file_name.endswith('.img'))
+
+    def get_image(self, url: str) -> bytes:
+        """returns the bytes for the image at url, fetching / revalidating
+        it against object storage if it isn't cached or is older than
+        max_age.  If object storage can't be reached a stale copy is
+        returned if there is one.
+
+        :param url: url to the image
+        :type url: str
+        :return: the image bytes, or None if the image could not be retrieved
+        :rtype: bytes
+        """
+        cached_image = self._get_source(url)
+        if cached_image is None:
+            return None
+        return cached_image.content
+
+    def get_rendition(self,
+                      url: str,
+                      width: int=constants.RENDITION_WIDTH,
+                      image_format: str=constants.RENDITION_FORMAT) -> bytes:
+        """returns the image at url scaled down to at most `width` pixels
+        wide and re-encoded in `image_format`.  Renditions are cached by
+        url / width / format, with the ETag of the image they were made
+        from, and re-created if the source image changes.  The source image
+        is only read once the rendition is older than max_age, so the full
+        resolution images don't take up the memory cache.
+
+        :param url: url to the full resolution image
+        :type url: str
+        :param width: maximum width of the rendition, images narrower than
+            this are not scaled, defaults to constants.RENDITION_WIDTH
+        :type width: int, optional
+        :param image_format: a format PIL can write, ie WEBP or PNG, defaults
+            to constants.RENDITION_FORMAT
+        :type image_format: str, optional
+        :return: the rendition bytes, or None if the image could not be
+            retrieved or converted
+        :rtype: bytes
+        """
+        rendition_key = f'{url}?width={width}&format={image_format}'
+        rendition = self._get_cached(rendition_key)
+        if rendition is not None and (time.time() - rendition.checked) < self.max_age:
+            with self.lock:
+                self.hits += 1
+            return rendition.content
+
+        source_image = self._get_source(url)
+        if source_image is None:
+            # object storage can't be reached, serve the stale copy if any
+            return rendition.content if rendition is not None else None
+        # renditions are tagged with the etag of the image they were made
+        # from, and when it was last checked
+        if rendition is not None and rendition.etag == source_image.etag:
+            with self.lock:
+                self.hits += 1
+            rendition = CachedImage(content=rendition.content,
+                                    etag=rendition.etag,
+                                    checked=source_image.checked)
+            self._set_memory(rendition_key, rendition)
+            self._write_disk(rendition_key, rendition, write_content=False)
+            return rendition.content
+
+        with self.lock:
+            self.misses += 1
+        try:
+            content = self.make_rendition(source_image.content, width, image_format)
+        except (OSError, ValueError) as err:
+            LOGGER.warning(f"unable to create a rendition of {url}: {err}")
+            return None
+        rendition = CachedImage(content=content, etag=source_image.etag,
+                                checked=source_image.checked)
+        self._set_memory(rendition_key, rendition)
+        self._write_disk(rendition_key, rendition)
+        return rendition.content
+
+    def get_renditions(self,
+                       urls: list,
+                       width: int=constants.RENDITION_WIDTH,
+                       image_format: str=constants.RENDITION_FORMAT) -> dict:
+        """returns the renditions for a number of images, the images that
+        aren't cached are fetched and scaled concurrently, see get_rendition
+
+        :param urls: urls to the full resolution images
+        :type urls: list
+        :return: dictionary of url -> rendition bytes, None if the image
+            could not be retrieved or converted
+        :rtype: dict
+        """
+        urls = list(dict.fromkeys(urls))
+        # the requests made by the workers are counted in the caller's rerun
+        rerun_requests = metrics.METRICS.get_rerun()
+
+        def get_rendition(url):
+            with metrics.METRICS.join_rerun(rerun_requests):
+                return self.get_rendition(url, width=width, image_format=image_format)
+        renditions = self.executor.map(get_rendition, urls)
+        return dict(zip(urls, renditions))
+
+    def make_rendition(self, content: bytes, width: int, image_format: str) -> bytes:
+        """scales the image in content down to width, preserving the aspect
+        ratio, and encodes it in image_format
+        """
+        image = PIL.Image.open(io.BytesIO(content))
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), PIL.Image.LANCZOS)
+        if image_format.upper() != 'PNG' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        image.save(output, format=image_format, optimize=True)
+        return output.getvalue()
+
+    def _get_cached(self, key: str) -> CachedImage:
+        """returns the cached image for key, from memory, or disk, or None if
+        it's not cached
+        """
+        with self.lock:
+            cached_image = self.memory.get(key)
+            if cached_image is not None:
+                self.memory.move_to_end(key)
+        if cached_image is None:
+            cached_image = self._read_disk(key)
+            if cached_image is not None:
+                self._set_memory(key, cached_image)
+        return cached_image
+
+    def _get_source(self, url: str) -> CachedImage:
+        cached_image = self._get_cached(url)
+        if cached_image is not None and \
+                (time.time() - cached_image.checked) < self.max_age:
+            with self.lock:
+                self.hits += 1
+            return cached_image
+
+        with self.lock:
+            self.misses += 1
+        return self._fetch(url, cached_image)
+
+    def _fetch(self, url: str, cached_image: CachedImage=None) -> CachedImage:
+        headers = {}
+        if cached_image is not None and cached_image.etag:
+            headers['If-None-Match'] = cached_image.etag
+        try:
+            with metrics.METRICS.objstore_request('get_object'):
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            not_modified = resp.status_code == 304 and cached_image is not None
+            if not_modified:
+                LOGGER.debug(f"not modified: {url}")
+                with self.lock:
+                    self.revalidations += 1
+                cached_image = CachedImage(
+                    content=cached_image.content,
+                    etag=cached_image.etag)
+            else:
+                resp.raise_for_status()
+                cached_image = CachedImage(
+                    content=resp.content,
+                    etag=resp.headers.get('ETag'))
+        except requests.RequestException as err:
+            LOGGER.warning(f"unable to retrieve {url}: {err}")
+            return cached_image
+
+        self._set_memory(url, cached_image)
+        self._write_disk(url, cached_image, write_content=not not_modified)
+        return cached_image
+
+    def _set_memory(self, url: str, cached_image: CachedImage):
+        with self.lock:
+            if url in self.memory:
+                self.memory_bytes -= len(self.memory.pop(url).content)
+            self.memory[url] = cached_image
+            self.memory_bytes += len(cached_image.content)
+            while self.memory_bytes > self.memory_budget and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted.content)
+
+    def _get_disk_path(self, url: str) -> str:
+        url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, url_hash)
+
+    def _read_disk(self, url: str) -> CachedImage:
+        if not self.cache_dir:
+            return None
+        disk_path = self._get_disk_path(url)
+        try:
+            with open(f'{disk_path}.json', 'r') as fh:
+                metadata = json.load(fh)
+            with open(f'{disk_path}.img', 'rb') as fh:
+                content = fh.read()
+        except (OSError, ValueError):
+            return None
+        return CachedImage(content=content,
+                           etag=metadata.get('etag'),
+                           checked=metadata.get('checked'))
+
+    def _write_disk(self, url: str, cached_image: CachedImage,
+                    write_content: bool=True):
+        """writes the image and then its metadata.  Each file is written to a
+        temporary file and moved into place, so readers never see a partly
+        written file, and _read_disk reads the metadata first, so a reader
+        that sees the new metadata also sees the new image.
+        """
+        if not self.cache_dir:
+            return
+        disk_path = self._get_disk_path(url)
+        metadata = json.dumps({'url': url, 'etag': cached_image.etag,
+                               'checked': cached_image.checked})
+        try:
+            if write_content:
+                tmp_path = self._write_tmp(cached_image.content)
+                with self.lock:
+                    if os.path.exists(f'{disk_path}.img'):
+                        self.disk_bytes -= os.path.getsize(f'{disk_path}.img')
+                    os.replace(tmp_path, f'{disk_path}.img')
+                    self.disk_bytes += len(cached_image.content)
+            os.replace(self._write_tmp(metadata.encode('utf-8')), f'{disk_path}.json')
+        except OSError as err:
+            LOGGER.warning(f"unable to write {url} to the image cache: {err}")
+            return
+        with self.lock:
+            if self.disk_bytes > self.disk_budget:
+                self._evict_disk()
+
+    def _write_tmp(self, content: bytes) -> str:
+        """writes content to a new temporary file in the cache directory,
+        returning its path
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(content)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def _evict_disk(self):
+        """removes the least recently written images until the disk cache is
+        within 90% of its budget, called with the lock held
+        """
+        images = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.img'):
+                file_path = os.path.join(self.cache_dir, file_name)
+                images.append((os.path.getmtime(file_path), file_path))
+        images.sort()
+        for _, file_path in images:
+            if self.disk_bytes <= self.disk_budget * 0.9:
+                break
+            try:
+                file_size = os.path.getsize(file_path)
+                os.remove(file_path)
+                self.disk_bytes -= file_size
+                os.remove(f'{os.path.splitext(file_path)[0]}.json')
+            except OSError as err:
+                LOGGER.warning(f"unable to evict {file_path}: {err}")
+
+    def get_stats(self) -> dict:
+        """returns the image cache counters
+
+        :return: dictionary with the keys hits, misses, hit_ratio,
+            revalidations, memory_bytes and disk_bytes
+        :rtype: dict
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'revalidations': self.revalidations,
+                'memory_bytes': self.memory_bytes,
+                'disk_bytes': self.disk_bytes
+            }
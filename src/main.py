@@ -1,8 +1,12 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import logging.config
 import os.path
 import logging
 import data_interface
+import metrics
+import rerun_memo
+import warmup
 import constants
 
 
@@ -16,239 +20,288 @@ if 'logger' not in st.session_state:
 else:
     LOGGER = st.session_state.logger
 
-# store this in the state so it gets retained, reducing round trips
-# to object storage
-SPD = data_interface.SnowPackData()
+
+def start_rerun():
+    """starts counting the object store requests made by this rerun, and
+    memoizing its catalog queries.  Called by the widget callbacks as well
+    as the script, as the callbacks run before the script.
+    """
+    metrics.METRICS.start_rerun()
+    rerun_memo.start()
+
+def end_rerun():
+    rerun_memo.end()
+    metrics.METRICS.end_rerun()
+
+def is_fragment_rerun() -> bool:
+    """returns True if only a fragment, rather than the whole script, is
+    being rerun
+    """
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+@st.cache_resource
+def start_metrics():
+    """starts serving the metrics / health endpoints and / or logging the
+    metrics summary, and starts warming up, once per process.  These have
+    already been started if the app was launched by serve.py.
+    """
+    server = None
+    summary_logger = None
+    if constants.METRICS_PORT:
+        server = metrics.start_server(port=constants.METRICS_PORT)
+    if constants.METRICS_LOG_INTERVAL:
+        summary_logger = metrics.SummaryLogger(
+            interval=constants.METRICS_LOG_INTERVAL)
+        summary_logger.start()
+    warmup.WARM_UP.start()
+    return server, summary_logger
 
 st.set_page_config(
     page_title="Historical Snowpack Analysis",
     page_icon="❄"
 )
 
-DISPLAY = st.container()
+start_metrics()
+# shared across sessions / reruns, reducing round trips to object storage.
+# The catalog is only read from object storage by the background refresher,
+# or when it expires (constants.CATALOG_TTL) if background refresh is
+# disabled, or when SnowPackData.invalidate() is called.  Waits for the
+# catalog if it is still being loaded.
+SPD = warmup.WARM_UP.get_snowpack_data()
+IMAGES = warmup.WARM_UP.get_image_cache()
+
+
+# catalog queries, each is made at most once per rerun
+def get_selected_sats() -> tuple:
+    # every satellite if none are selected
+    return tuple(data_interface.Satellite[sat_str]
+                 for sat_str in st.session_state.sat or constants.SAT_OPTIONS)
+
+@rerun_memo.memoized
+def get_name_index(area_type: data_interface.AreaType, sats: tuple) -> data_interface.AreaNameIndex:
+    # the names of the areas for the newest date all the satellites have, the
+    # newest date may still be being published
+    return SPD.get_name_index(area_type=area_type, sats=list(sats))
+
+@rerun_memo.memoized
+def search_area_names(area_type: data_interface.AreaType, sats: tuple, query: str) -> list:
+    return get_name_index(area_type, sats).search(query, limit=constants.AREA_SEARCH_LIMIT)
+
+@rerun_memo.memoized
+def get_dates(sats: tuple, area_type: data_interface.AreaType) -> list:
+    # every date that any of the selected satellites has, newest first, the
+    # VIIRS images are usually published after the MODIS ones
+    dates = SPD.get_available_dates(
+        sats=list(sats),
+        area_type=area_type,
+        number_of_dates=constants.DAYS_BACK)
+    return sorted(dates, reverse=True)
+
+@rerun_memo.memoized
+def get_url_matrix(area_name: str, dates: tuple, sats: tuple,
+                   area_type: data_interface.AreaType) -> dict:
+    # date -> sat -> url, None where there is no image
+    return SPD.get_url_matrix(
+        area_name=area_name,
+        dates=list(dates),
+        sats=list(sats),
+        area_type=area_type)
+
 
 # session state variables
 if 'wat_or_basin' not in st.session_state:
     st.session_state['wat_or_basin'] = constants.WAT_BASIN_OPTIONS[0]
     LOGGER.debug(f"setting wat_or_basin for first time: {st.session_state.wat_or_basin}")
 
+if 'dates_shown' not in st.session_state:
+    st.session_state['dates_shown'] = constants.DATES_PER_PAGE
+
+if 'area_search' not in st.session_state:
+    st.session_state['area_search'] = ''
+
 if 'area_name' not in st.session_state:
-    st.session_state['area_name'] = "Boundary"
+    st.session_state['area_name'] = constants.DEFAULT_AREA_NAME
     LOGGER.debug(f"area name: {st.session_state.area_name}")
-    #show_images(area_type=data_interface.AreaType['watersheds'], area_name='Boundary')
 
 
+# the callbacks only update the session state, the page is drawn by the rerun
+# that follows them
 def wat_basin_changed(*args, **kwargs):
+    start_rerun()
     LOGGER.debug(f"watbas - area type is: {st.session_state['wat_or_basin']}")
-    LOGGER.debug(f"watbas - satellites are {st.session_state['sat']}")
-    LOGGER.debug(f"watbas - area name: {st.session_state.area_name}")
-    # if the are type: (watershed/basin) changes then we need to
-    # 1) reload the basin / watershed names
-    # 2) choose default basin / watershed
-    # 3) reload the images
-    post_area_name_sidebar(st.session_state['wat_or_basin'])
-
-    #cur_sat = data_interface.Satellite[st.session_state['sat']]
-    area_type = data_interface.AreaType[st.session_state['wat_or_basin']]
-    name_url_dict = SPD.get_names(sat=cur_sat, area_type=area_type)
-
-
-    wat_basin = data_interface.AreaType[st.session_state.wat_or_basin.lower()]
-    show_images(area_type=wat_basin,
-                area_name=st.session_state.area_name,
-                sat_list=st.session_state.sat)
-
+    # if the area type: (watershed/basin) changes then choose the default
+    # basin / watershed, the names are reloaded by the rerun
+    name_index = get_name_index(data_interface.AreaType[st.session_state.wat_or_basin],
+                                get_selected_sats())
+    if constants.DEFAULT_AREA_NAME in name_index or not len(name_index):
+        st.session_state.area_name = constants.DEFAULT_AREA_NAME
+    else:
+        st.session_state.area_name = name_index.get_names()[0]
+    st.session_state.area_search = ''
+    st.session_state.dates_shown = constants.DATES_PER_PAGE
 
 def breakdown_type(*args, **kwargs):
-    LOGGER.debug(f"area type is: {st.session_state['wat_or_basin']}")
-    LOGGER.debug(f"satellites are {st.session_state['sat']}")
+    start_rerun()
     LOGGER.debug(f"area name: {st.session_state.area_name}")
-
-    # convert the strings for satellite(sat) and area_type to enumerations
-    wat_basin = data_interface.AreaType[st.session_state.wat_or_basin.lower()]
-
-    #sat = data_interface.Satellite[st.session_state['sat'][0].lower()]
-
-    # get the dates that are available for the modis sat.. modis data is usually
-    # more quickly processed than the viirs, and therefor the viirs is usually
-    # a subset of modis... so just getting dates for modis then iterate
-    # over those dates making the viirs data visiible if it can be found
-    show_images(area_type=wat_basin,
-                area_name=st.session_state.area_name,
-                sat_list=st.session_state.sat)
+    st.session_state.dates_shown = constants.DATES_PER_PAGE
 
 def sat_changed(*args, **kwargs):
-    LOGGER.debug(f"sat - area type is: {st.session_state['wat_or_basin']}")
+    start_rerun()
     LOGGER.debug(f"sat - satellites are {st.session_state['sat']}")
-    if ('area_name' in st.session_state) and st.session_state.area_name:
-        # only update the images if the area type, and an actual area
-        # have been selected.
-        LOGGER.debug(f"sat - area name: {st.session_state.area_name}")
-
-        #names = list(sat_name_url_dict['modis'].keys())
-        name_url_dict = SPD.get_names(
-            sat=data_interface.Satellite['modis'], # area names are independent of satellite so just using modis here
-            area_type=data_interface.AreaType[st.session_state.wat_or_basin.lower()])
-        names = list(name_url_dict.keys())
 
-        wat_basin = data_interface.AreaType[st.session_state.wat_or_basin.lower()]
+def load_more_dates(*args, **kwargs):
+    start_rerun()
+    st.session_state.dates_shown = min(
+        st.session_state.dates_shown + constants.DATES_PER_PAGE,
+        constants.DAYS_BACK)
+    LOGGER.debug(f"dates shown: {st.session_state.dates_shown}")
 
-        show_images(area_type=wat_basin,
-                    area_name=st.session_state.area_name,
-                    sat_list=st.session_state.sat)
 
-def show_images(area_type, area_name, sat_list):
-    # sat_list - list of sattellite data to display
-    # determine what satellites are selected, use modis if its in the list
+def show_sidebar():
+    st.sidebar.success("Configure what you want to view.")
 
-    LOGGER.debug(f"satlist: {sat_list}")
-    if not sat_list:
-        with DISPLAY.empty():
-            DISPLAY.write(f'## No Satellites are currently selected for viewing')
-    else:
-        if 'modis' in st.session_state.sat:
-            cur_sat_str = 'modis'
-        else:
-            cur_sat_str = sat_list[0]
-        cur_sat = data_interface.Satellite[cur_sat_str]
-
-        cur_sat_date_list = SPD.get_dates(
-            sat=cur_sat,
-            area_type=area_type,
-            number_of_dates=constants.DAYS_BACK
-            )
-        cur_sat_date_list.sort(reverse=True)
-        with DISPLAY.empty():
-            # Want to display the data for the given satellite / area type
-            # combination
-            # sooo
-            # ----
-            # Title: Area_name
-            # Date: date
-            # ----------------
-            # satellite: sat_name
-            # <image>
-            # satellite: sat_name
-            # <image>
-            #
-            # Date: date
-            # --------------
-            # satellite: sat_name
-            # <image>
-            # satellite: sat_name
-            # <image>
-            #
-            # ...blah blah blah
-            DISPLAY.write(f'# {area_type.name[0:-1].capitalize()}: *{area_name}* ')
-            for date in cur_sat_date_list:
-                first_sat = True
-                LOGGER.debug(f"satellites: {sat_list} {type(sat_list)}")
-                for sat_str in sat_list:
-                    LOGGER.debug(f"sat_str: {sat_str}")
-                    if first_sat:
-                        first_sat = False
-                        DISPLAY.write(f'### Date: *{date}* ')
-
-                    sat_url = SPD.get_url_by_date(
-                                date_str=date,
-                                sat=data_interface.Satellite[sat_str],
-                                area_type=area_type,
-                                area_name=area_name)
-                    LOGGER.debug(f"{sat_str} url: - {sat_url}- {type(sat_url)}")
-                    DISPLAY.write(f'#### Satellite: *{sat_str}*')
-                    if sat_url:
-                        DISPLAY.image(
-                            str(sat_url),
-                            width=600, # Manually Adjust the width of the image as per requirement
-                        )
-                DISPLAY.write('---------')
-
-
-st.sidebar.success("Configure what you want to view.")
-
-# -- Satellite product to view
-# Add callbacks to change display when this is changed
-sat = st.sidebar.multiselect(
-    label="Which Satelite based Snowpack Product",
-    options=constants.SAT_OPTIONS,
-    default=constants.SAT_OPTIONS,
-    on_change=sat_changed,
-    key='sat'
-)
-LOGGER.debug(f"sat from multiselect: {sat}")
-
-# -- Watershed or Basin radio button
-wat_or_basin = st.sidebar.radio(
-    "View data by Watershed or Basin",
-    on_change=wat_basin_changed,
-    key='wat_or_basin',
-    index=0,
-    options=constants.WAT_BASIN_OPTIONS
+    # -- Satellite product to view
+    st.sidebar.multiselect(
+        label="Which Satelite based Snowpack Product",
+        options=constants.SAT_OPTIONS,
+        default=constants.SAT_OPTIONS,
+        on_change=sat_changed,
+        key='sat'
     )
 
-DISPLAY.write("# Historical Snowpack Analysis ❄")
-
-# get the possible options for watershed / Basin
-# and populate into a select list
-LOGGER.debug(f"watershed or basin: {wat_or_basin}")
-LOGGER.debug(f"satellites: {sat} {st.session_state.sat}")
-
-def post_area_name_sidebar(area_type_str):
-    global names
-    global sidebar_area_selector
-    LOGGER.debug(f"area type string: {area_type_str}")
-    area_type = data_interface.AreaType[area_type_str]
-    cur_sat = data_interface.Satellite['modis'] # always default
+    # -- Watershed or Basin radio button
+    st.sidebar.radio(
+        "View data by Watershed or Basin",
+        on_change=wat_basin_changed,
+        key='wat_or_basin',
+        options=constants.WAT_BASIN_OPTIONS
+        )
+
+@st.fragment
+@metrics.timed
+def show_images():
+    """draws the area selector and the image grid.  Changing the area or
+    loading more dates only reruns this fragment, changing the satellites or
+    area type in the sidebar reruns the whole script.
+    """
+    fragment_rerun = is_fragment_rerun()
+    start_rerun()
+    try:
+        _show_images()
+    finally:
+        if fragment_rerun:
+            end_rerun()
+
+def _show_images():
+    sat_list = st.session_state.sat
+    area_type = data_interface.AreaType[st.session_state.wat_or_basin]
+    LOGGER.debug(f"satlist: {sat_list}")
 
-    name_url_dict = SPD.get_names(
-        sat=cur_sat,
-        area_type=area_type)
-    names = list(name_url_dict.keys())
-
-    LOGGER.debug(f"watershed or basin: {wat_or_basin}")
-    LOGGER.debug(f"names: {names[0:4]}...")
-    LOGGER.debug(f"sidebar_area_selector: {sidebar_area_selector}")
-    with sidebar_area_selector.empty():
-        option = sidebar_area_selector.selectbox(
-            label=f'Which {wat_or_basin}',
-            options=names,
-            key='area_name',
-            on_change=breakdown_type,
-            index=0)
-
-# get the data
-sat_name_url_dict = {}
-for sat_str in sat:
-    LOGGER.debug(f"sat_str: {sat_str}")
-    cur_sat = data_interface.Satellite[sat_str]
-    area_type = data_interface.AreaType[wat_or_basin]
-    name_url_dict = SPD.get_names(sat=cur_sat, area_type=area_type)
-    sat_name_url_dict[sat_str] = name_url_dict
-
-
-sidebar_area_selector = st.sidebar.container()
-
-LOGGER.debug(f"session state sat: {st.session_state.sat}")
-if st.session_state.sat:
-    # this is the default satellite - modis
-    # names = list(sat_name_url_dict['modis'].keys())
-    # LOGGER.debug(f"names: {type(names)} {names}")
-
-    # # populate the area pulldown
-    # option = st.sidebar.selectbox(
-    #     label=f'Which {wat_or_basin}',
-    #     options=names,
-    #     key='area_name',
-    #     on_change=breakdown_type,
-    #     index=0)
-    post_area_name_sidebar(wat_or_basin)
-
-# show_images(area_type=data_interface.AreaType['watersheds'], area_name='Boundary')
-
-# # # load initial view
-if 'firstload' not in st.session_state:
-    LOGGER.debug("loading first view")
-    show_images(area_type=data_interface.AreaType['watersheds'],
-                area_name='Boundary',
-                sat_list=st.session_state.sat)
-    st.session_state.firstload = True
+    # type ahead search of the areas, the pulldown lists the best matches
+    # rather than every area
+    name_index = get_name_index(area_type, get_selected_sats())
+    query = st.text_input(
+        label=f'Search the {area_type.name}',
+        key='area_search',
+        placeholder='start typing the name',
+        on_change=breakdown_type)
+    names = search_area_names(area_type, get_selected_sats(), query)
+    area_name = st.session_state.area_name
+    if not len(name_index):
+        # there is nothing to select, ie the catalog couldn't be loaded
+        area_name = None
+    else:
+        if area_name is None:
+            area_name = constants.DEFAULT_AREA_NAME
+        if area_name not in names:
+            if names and (query or area_name not in name_index):
+                # show the best match
+                area_name = names[0]
+            elif area_name in name_index:
+                # keep the selected area listed
+                names = [area_name] + names
+    # the pulldown is a new widget whenever its options change, which would
+    # reset it to the first option, so the selection is set explicitly
+    st.session_state.area_name = area_name
+    if query and not search_area_names(area_type, get_selected_sats(), query):
+        st.caption(f'no {area_type.name} match *{query}*')
+    elif len(names) >= constants.AREA_SEARCH_LIMIT:
+        st.caption(f'showing the first {constants.AREA_SEARCH_LIMIT} of '
+                   f'{len(name_index)} {area_type.name}, type to narrow the search')
+    area_name = st.selectbox(
+        label=f'Which {area_type.name[0:-1]}',
+        options=names,
+        key='area_name',
+        on_change=breakdown_type)
+    if not names:
+        if not len(name_index):
+            st.write(f'## No {area_type.name} are available')
+        return
+    if not sat_list:
+        st.write(f'## No Satellites are currently selected for viewing')
+        return
+
+    sats = tuple(data_interface.Satellite[sat_str] for sat_str in sat_list)
+    cur_sat_date_list = get_dates(sats, area_type)
+    # newest dates first, only as many as have been requested
+    page_dates = tuple(cur_sat_date_list[0:st.session_state.dates_shown])
+    url_matrix = get_url_matrix(area_name, page_dates, sats, area_type)
+    # the images that aren't cached are fetched / scaled concurrently, rather
+    # than one at a time as the grid is drawn
+    renditions = IMAGES.get_renditions(
+        [str(sat_url) for date_urls in url_matrix.values()
+         for sat_url in date_urls.values() if sat_url],
+        width=constants.RENDITION_WIDTH)
+
+    # Title: Area_name
+    # Date: date
+    # ----------------
+    # satellite: sat_name
+    # <image>
+    # satellite: sat_name
+    # <image>
+    # ...
+    st.write(f'# {area_type.name[0:-1].capitalize()}: *{area_name}* ')
+    for date in page_dates:
+        st.write(f'### Date: *{date}* ')
+        for sat_str in sat_list:
+            sat_url = url_matrix[date][data_interface.Satellite[sat_str]]
+            LOGGER.debug(f"{sat_str} url: - {sat_url}- {type(sat_url)}")
+            st.write(f'#### Satellite: *{sat_str}*')
+            if sat_url:
+                # show a scaled down copy, falling back to the object
+                # store url if it can't be created.  The full
+                # resolution image is only downloaded if the link is
+                # followed
+                image = renditions.get(str(sat_url)) or str(sat_url)
+                st.image(
+                    image,
+                    width=constants.RENDITION_WIDTH, # Manually Adjust the width of the image as per requirement
+                )
+                st.markdown(f'[full resolution image]({sat_url})')
+            else:
+                st.caption('not available')
+        st.write('---------')
+    if len(page_dates) < len(cur_sat_date_list):
+        st.caption(f'showing {len(page_dates)} of '
+                   f'{len(cur_sat_date_list)} dates')
+
+    st.button(
+        'Load more dates',
+        on_click=load_more_dates,
+        disabled=st.session_state.dates_shown >= constants.DAYS_BACK)
+
+
+def main():
+    # counts the object store requests made by this rerun, including any made
+    # by the widget callbacks, which run before the script
+    start_rerun()
+    try:
+        st.write("# Historical Snowpack Analysis ❄")
+        show_sidebar()
+        show_images()
+    finally:
+        end_rerun()
+
+main()
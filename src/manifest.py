@@ -0,0 +1,90 @@
+"""writes the catalog of the plot archive (the dates, and the image file names
+for every satellite / area type / date) to a gzipped json manifest, and
+optionally uploads it to object storage next to the plots.
+
+The app reads the manifest with a single request when MANIFEST_OBJECT is set,
+rather than listing the archive.  Run it after the days plots are published:
+
+    python manifest.py --upload
+"""
+import argparse
+import logging
+import logging.config
+import os.path
+import sys
+import tempfile
+
+import constants
+import data_interface
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_OBJECT = 'snowpack_archive/catalog_manifest.json.gz'
+
+
+def build_manifest(output_path: str) -> data_interface.SnowPackData:
+    """lists the archive and writes its catalog to output_path
+
+    :param output_path: file the manifest is written to
+    :type output_path: str
+    :return: the SnowPackData the catalog was read into
+    :rtype: data_interface.SnowPackData
+    """
+    # the manifest is written from a listing, never from an older manifest,
+    # and holds every date in the archive
+    spd = data_interface.SnowPackData(background_refresh=True,
+                                      manifest_object=None,
+                                      max_entries=sys.maxsize)
+    spd.refresh()
+    spd.save_snapshot(output_path)
+    return spd
+
+
+def upload_manifest(spd: data_interface.SnowPackData,
+                    output_path: str,
+                    manifest_object: str=DEFAULT_MANIFEST_OBJECT):
+    """uploads the manifest to object storage as a public object, so the
+    app can read it without credentials
+    """
+    with metrics.METRICS.objstore_request('put_object'):
+        spd.objstor.put_object(ostore_path=manifest_object,
+                               local_path=output_path,
+                               public=True)
+    LOGGER.info(f"uploaded the manifest to {manifest_object}")
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output',
+                        help='file to write the manifest to, defaults to a '
+                             'temporary file when uploading')
+    parser.add_argument('--upload', action='store_true',
+                        help='upload the manifest to object storage')
+    parser.add_argument('--object',
+                        default=constants.MANIFEST_OBJECT or DEFAULT_MANIFEST_OBJECT,
+                        help='object name to upload the manifest to, defaults '
+                             f'to MANIFEST_OBJECT or {DEFAULT_MANIFEST_OBJECT}')
+    args = parser.parse_args(argv)
+    if not args.output and not args.upload:
+        parser.error('one of --output or --upload is required')
+    return args
+
+
+def main(argv=None):
+    args = get_args(argv)
+    log_config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'logging.config')
+    logging.config.fileConfig(log_config_path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = args.output or os.path.join(tmp_dir, os.path.basename(args.object))
+        spd = build_manifest(output_path)
+        stats = spd.get_stats()
+        LOGGER.info(f"wrote the manifest for {stats['entries']} satellite / "
+                    f"area type / dates to {output_path}")
+        if args.upload:
+            upload_manifest(spd, output_path, manifest_object=args.object)
+
+
+if __name__ == '__main__':
+    main()
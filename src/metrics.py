@@ -0,0 +1,390 @@
+import bisect
+import contextlib
+import functools
+import http.server
+import logging
+import threading
+import time
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0)
+# upper bounds of the object store requests per rerun histogram buckets
+REQUEST_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class Histogram():
+    """cumulative bucket counts, sum and count of the observed values"""
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative_counts(self) -> list:
+        cumulative_counts = []
+        total = 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            cumulative_counts.append(total)
+        return cumulative_counts
+
+
+class Metrics():
+    """process wide registry of counters and histograms, rendered in the
+    prometheus text exposition format.
+
+    Metrics are identified by name and a tuple of (label, value) pairs.
+    Gauges aren't stored, they are read when the metrics are rendered from
+    the collectors registered with `register_collector`, ie the cache
+    counters of the shared SnowPackData.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (name, labels) -> value
+        self.counters = {}
+        # (name, labels) -> Histogram
+        self.histograms = {}
+        # name -> help text
+        self.descriptions = {}
+        # prefix -> callable returning a dict of gauge name -> value
+        self.collectors = {}
+        # the object store requests made by the current rerun, per thread
+        self.rerun = threading.local()
+
+    def describe(self, name: str, description: str):
+        self.descriptions[name] = description
+
+    def inc(self, name: str, labels: tuple=(), value: float=1):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: tuple=(),
+                buckets: tuple=LATENCY_BUCKETS):
+        with self.lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def register_collector(self, prefix: str, collector):
+        """registers a callable that returns a dictionary of gauge values,
+        each is rendered as `<prefix>_<key>`.  Registering the same prefix
+        again replaces the collector.
+        """
+        with self.lock:
+            self.collectors[prefix] = collector
+
+    @contextlib.contextmanager
+    def time_call(self, function_name: str):
+        """times the enclosed block as a call to function_name"""
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.inc('snowpack_calls_total',
+                     (('function', function_name), ('status', status)))
+            self.observe('snowpack_call_seconds', elapsed,
+                         (('function', function_name),))
+
+    @contextlib.contextmanager
+    def objstore_request(self, operation: str):
+        """counts and times the enclosed block as a request to object
+        storage, adding it to the current rerun if one has been started on
+        this thread
+        """
+        rerun_requests = getattr(self.rerun, 'requests', None)
+        if rerun_requests is not None:
+            # a rerun's requests may be made on several threads, see
+            # join_rerun
+            with self.lock:
+                rerun_requests[operation] = rerun_requests.get(operation, 0) + 1
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.inc('snowpack_objstore_requests_total',
+                     (('operation', operation), ('status', status)))
+            self.observe('snowpack_objstore_request_seconds', elapsed,
+                         (('operation', operation),))
+
+    def start_rerun(self):
+        """starts accounting for the object store requests made by a rerun
+        of the streamlit script, on the calling thread.  Widget callbacks run
+        before the script, so if they have already started the rerun it is
+        continued.
+        """
+        if getattr(self.rerun, 'requests', None) is not None:
+            return
+        self.rerun.requests = {}
+        self.rerun.start = time.perf_counter()
+
+    def get_rerun(self) -> dict:
+        """returns the object store request counts of the rerun started on
+        the calling thread, to pass to join_rerun, None if no rerun was
+        started
+        """
+        return getattr(self.rerun, 'requests', None)
+
+    @contextlib.contextmanager
+    def join_rerun(self, rerun_requests: dict):
+        """adds the object store requests made on the calling thread by the
+        enclosed block to a rerun started on another thread, ie by a worker
+        of a thread pool the script hands requests to
+
+        :param rerun_requests: the counts returned by get_rerun on the
+            script thread, if None the requests aren't added to a rerun
+        :type rerun_requests: dict
+        """
+        previous = getattr(self.rerun, 'requests', None)
+        self.rerun.requests = rerun_requests
+        try:
+            yield
+        finally:
+            self.rerun.requests = previous
+
+    def end_rerun(self) -> dict:
+        """ends the rerun started on the calling thread, records its duration
+        and object store request count, and logs a summary
+
+        :return: dictionary with the keys seconds and requests, requests is a
+            dictionary of operation -> count, None if no rerun was started
+        :rtype: dict
+        """
+        rerun_requests = getattr(self.rerun, 'requests', None)
+        if rerun_requests is None:
+            return None
+        elapsed = time.perf_counter() - self.rerun.start
+        self.rerun.requests = None
+        request_count = sum(rerun_requests.values())
+        self.inc('snowpack_reruns_total')
+        self.observe('snowpack_rerun_seconds', elapsed)
+        self.observe('snowpack_rerun_objstore_requests', request_count,
+                     buckets=REQUEST_BUCKETS)
+        summary = {'seconds': round(elapsed, 4), 'requests': rerun_requests}
+        LOGGER.info(f"rerun summary: {summary}")
+        return summary
+
+    def get_gauges(self) -> dict:
+        """returns the current values of the registered collectors
+
+        :return: dictionary of gauge name -> value
+        :rtype: dict
+        """
+        with self.lock:
+            collectors = list(self.collectors.items())
+        gauges = {}
+        for prefix, collector in collectors:
+            try:
+                values = collector()
+            except Exception as err:
+                LOGGER.warning(f"unable to collect {prefix} metrics: {err}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    gauges[f'{prefix}_{key}'] = value
+        return gauges
+
+    def render(self) -> str:
+        """returns every metric in the prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histogram_values = [
+                (key, histogram.buckets, histogram.get_cumulative_counts(),
+                 histogram.sum, histogram.count)
+                for key, histogram in histograms]
+
+        described = set()
+        def add_header(name, metric_type):
+            if name in described:
+                return
+            described.add(name)
+            if name in self.descriptions:
+                lines.append(f'# HELP {name} {self.descriptions[name]}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        for (name, labels), value in counters:
+            add_header(name, 'counter')
+            lines.append(f'{name}{format_labels(labels)} {value}')
+
+        for (name, labels), buckets, cumulative_counts, total, count in histogram_values:
+            add_header(name, 'histogram')
+            for bucket, bucket_count in zip(buckets, cumulative_counts):
+                bucket_labels = labels + (('le', str(bucket)),)
+                lines.append(f'{name}_bucket{format_labels(bucket_labels)} {bucket_count}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+        for name, value in sorted(self.get_gauges().items()):
+            add_header(name, 'gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def get_summary(self) -> dict:
+        """returns the call counts and mean latencies, for logging
+
+        :return: dictionary with the keys calls, objstore_requests and gauges
+        :rtype: dict
+        """
+        summary = {'calls': {}, 'objstore_requests': {}}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                if name == 'snowpack_call_seconds':
+                    summary_key = 'calls'
+                elif name == 'snowpack_objstore_request_seconds':
+                    summary_key = 'objstore_requests'
+                else:
+                    continue
+                summary[summary_key][dict(labels).popitem()[1]] = {
+                    'count': histogram.count,
+                    'mean_seconds': round(histogram.sum / histogram.count, 4)}
+        summary['gauges'] = self.get_gauges()
+        return summary
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    label_strings = []
+    for label, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        label_strings.append(f'{label}="{value}"')
+    return '{' + ','.join(label_strings) + '}'
+
+
+METRICS = Metrics()
+METRICS.describe('snowpack_calls_total', 'calls to instrumented functions')
+METRICS.describe('snowpack_call_seconds', 'latency of instrumented functions')
+METRICS.describe('snowpack_objstore_requests_total', 'requests made to object storage')
+METRICS.describe('snowpack_objstore_request_seconds', 'latency of object storage requests')
+METRICS.describe('snowpack_reruns_total', 'reruns of the streamlit script')
+METRICS.describe('snowpack_rerun_seconds', 'time to run the streamlit script')
+METRICS.describe('snowpack_rerun_objstore_requests', 'object storage requests made by a rerun')
+
+
+def timed(func):
+    """decorator that records the call count and latency of func in
+    METRICS, under its qualified name
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with METRICS.time_call(func.__qualname__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def render_metrics() -> tuple:
+    return 200, 'text/plain; version=0.0.4; charset=utf-8', METRICS.render()
+
+
+# path -> callable returning a tuple of (status, content type, body), see
+# add_route
+ROUTES = {'/metrics': render_metrics}
+
+SERVER = None
+SERVER_LOCK = threading.Lock()
+
+
+def add_route(path: str, route):
+    """serves the response returned by route at path, alongside /metrics,
+    ie the health checks
+
+    :param path: path to serve, ie /readyz
+    :type path: str
+    :param route: callable returning a tuple of (status code, content type,
+        body)
+    :type route: callable
+    """
+    ROUTES[path] = route
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        route = ROUTES.get(self.path.split('?')[0])
+        if route is None:
+            self.send_error(404)
+            return
+        try:
+            status, content_type, body = route()
+        except Exception:
+            LOGGER.exception(f"unable to serve {self.path}")
+            self.send_error(500)
+            return
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+def start_server(port: int=constants.METRICS_PORT) -> http.server.ThreadingHTTPServer:
+    """serves /metrics, and any other ROUTES, on port from a daemon thread.
+    Only one server is started per process, later calls return it.
+
+    :param port: port to listen on, defaults to constants.METRICS_PORT
+    :type port: int, optional
+    :return: the server, or None if it could not be started
+    :rtype: http.server.ThreadingHTTPServer
+    """
+    global SERVER
+    with SERVER_LOCK:
+        if SERVER is not None:
+            return SERVER
+        try:
+            server = http.server.ThreadingHTTPServer(('', port), MetricsHandler)
+        except OSError as err:
+            LOGGER.warning(f"unable to serve metrics on port {port}: {err}")
+            return None
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever,
+                                  name='metrics-server', daemon=True)
+        thread.start()
+        SERVER = server
+    LOGGER.info(f"serving metrics on port {port}")
+    return server
+
+
+class SummaryLogger(threading.Thread):
+    """logs the metrics summary every `interval` seconds, for deployments
+    that don't scrape the metrics endpoint
+    """
+    def __init__(self, interval: float=constants.METRICS_LOG_INTERVAL):
+        super().__init__(name='metrics-summary', daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            LOGGER.info(f"metrics summary: {METRICS.get_summary()}")
@@ -0,0 +1,118 @@
+import logging
+import os
+import socket
+import threading
+
+import boto3.session
+import botocore.config
+import certifi
+import minio
+import NRUtil.NRObjStoreUtil
+import requests
+import requests.adapters
+import urllib3
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+
+# statuses that object storage returns for transient failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+OBJSTORE_UTIL = None
+OBJSTORE_UTIL_LOCK = threading.Lock()
+
+
+def get_objstore_util() -> NRUtil.NRObjStoreUtil.ObjectStoreUtil:
+    """returns the ObjectStoreUtil shared by everything in the process, so
+    connections / TLS sessions to object storage are reused rather than
+    re-established by every SnowPackData.  Created on first use.
+
+    :return: the shared ObjectStoreUtil
+    :rtype: NRUtil.NRObjStoreUtil.ObjectStoreUtil
+    """
+    global OBJSTORE_UTIL
+    if OBJSTORE_UTIL is None:
+        with OBJSTORE_UTIL_LOCK:
+            if OBJSTORE_UTIL is None:
+                OBJSTORE_UTIL = create_objstore_util()
+    return OBJSTORE_UTIL
+
+
+def create_objstore_util() -> NRUtil.NRObjStoreUtil.ObjectStoreUtil:
+    """creates an ObjectStoreUtil whose minio / boto clients use a tuned
+    connection pool, timeouts and retries
+    """
+    objstor = NRUtil.NRObjStoreUtil.ObjectStoreUtil()
+    # NRUtil creates the minio client with its default pool, and the boto
+    # client (used for permissions) on first use, replace them with tuned
+    # versions
+    objstor.minio_client = minio.Minio(
+        objstor.obj_store_host,
+        objstor.obj_store_user,
+        objstor.obj_store_secret,
+        http_client=make_pool_manager())
+    objstor.boto_session = boto3.session.Session()
+    objstor.boto_client = objstor.boto_session.client(
+        service_name='s3',
+        aws_access_key_id=objstor.obj_store_user,
+        aws_secret_access_key=objstor.obj_store_secret,
+        endpoint_url=f'https://{objstor.obj_store_host}',
+        config=make_boto_config())
+    LOGGER.info(f"created the shared object store client for {objstor.obj_store_host}")
+    return objstor
+
+
+def make_retry() -> urllib3.Retry:
+    """retries connection errors and transient statuses, with exponential
+    backoff and jitter so that replicas retrying at the same time spread out
+    """
+    return urllib3.Retry(
+        total=constants.OBJSTORE_RETRIES,
+        backoff_factor=constants.OBJSTORE_BACKOFF,
+        backoff_jitter=constants.OBJSTORE_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False)
+
+
+def make_pool_manager() -> urllib3.PoolManager:
+    """the urllib3 pool used by the minio client, keeps up to
+    OBJSTORE_POOL_SIZE connections alive with TCP keep alive enabled
+    """
+    socket_options = urllib3.connection.HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=constants.OBJSTORE_POOL_SIZE,
+        block=False,
+        timeout=urllib3.Timeout(connect=constants.OBJSTORE_CONNECT_TIMEOUT,
+                                read=constants.OBJSTORE_READ_TIMEOUT),
+        retries=make_retry(),
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+        socket_options=socket_options)
+
+
+def make_boto_config() -> botocore.config.Config:
+    # standard retry mode backs off exponentially with jitter
+    return botocore.config.Config(
+        max_pool_connections=constants.OBJSTORE_POOL_SIZE,
+        connect_timeout=constants.OBJSTORE_CONNECT_TIMEOUT,
+        read_timeout=constants.OBJSTORE_READ_TIMEOUT,
+        retries={'max_attempts': constants.OBJSTORE_RETRIES + 1,
+                 'mode': 'standard'},
+        tcp_keepalive=True)
+
+
+def make_session() -> requests.Session:
+    """returns a requests session for reading public objects, with the same
+    pool size and retries as the object store clients
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=constants.OBJSTORE_POOL_SIZE,
+        max_retries=make_retry())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
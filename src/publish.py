@@ -0,0 +1,223 @@
+"""makes the snowpack plots in object storage publicly readable, so the app
+can link to them.  Run it after the days plots are uploaded:
+
+    python publish.py --start-date 2023.03.23 --sat viirs modis
+
+By default only the plots for yesterday are published, and plots that are
+already public are skipped.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import logging
+import logging.config
+import os.path
+import sys
+import threading
+import time
+
+import constants
+import data_interface
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RateLimiter():
+    """spaces calls to wait() at least 1 / rate seconds apart, across all
+    the threads sharing the limiter
+    """
+    def __init__(self, rate: float):
+        """
+        :param rate: maximum calls per second, if 0 or None calls aren't
+            limited
+        :type rate: float
+        """
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_call = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(now, self.next_call)
+            self.next_call = call_at + self.interval
+        if call_at > now:
+            time.sleep(call_at - now)
+
+
+class PublishReport():
+    """progress of a publish, updated as the objects complete"""
+    def __init__(self, total: int=0):
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.total = total
+        self.published = 0
+        self.skipped = 0
+        # list of (object name, error message)
+        self.failed = []
+
+    def add_result(self, object_name: str, published: bool=False,
+                   error: Exception=None):
+        with self.lock:
+            if error is not None:
+                self.failed.append((object_name, str(error)))
+            elif published:
+                self.published += 1
+            else:
+                self.skipped += 1
+
+    def get_completed(self) -> int:
+        return self.published + self.skipped + len(self.failed)
+
+    def __str__(self):
+        return (f"{self.get_completed()}/{self.total} objects, "
+                f"published: {self.published} skipped: {self.skipped} "
+                f"failed: {len(self.failed)} in "
+                f"{time.monotonic() - self.start:.1f}s")
+
+
+@metrics.timed
+def publish(spd: data_interface.SnowPackData,
+            sats: list=None,
+            area_types: list=None,
+            start_date: str=None,
+            end_date: str=None,
+            skip_public: bool=True,
+            max_workers: int=constants.PUBLISH_WORKERS,
+            rate: float=constants.PUBLISH_RATE,
+            progress=None) -> PublishReport:
+    """makes the plots for the satellites / area types / dates selected
+    publicly readable.  The permission updates are made concurrently,
+    limited to `rate` requests per second.
+
+    :param spd: lists the plots to publish, and holds the object store
+        client used to publish them
+    :type spd: data_interface.SnowPackData
+    :param sats: list of Satellite, defaults to None, all satellites
+    :type sats: list, optional
+    :param area_types: list of AreaType, defaults to None, all area types
+    :type area_types: list, optional
+    :param start_date: first date to publish, format 'YYYY.MM.DD', defaults
+        to None, no lower limit
+    :type start_date: str, optional
+    :param end_date: last date to publish, format 'YYYY.MM.DD', defaults to
+        None, no upper limit
+    :type end_date: str, optional
+    :param skip_public: check each objects permissions first, and skip the
+        ones that are already public, defaults to True
+    :type skip_public: bool, optional
+    :param max_workers: number of concurrent requests, defaults to
+        constants.PUBLISH_WORKERS
+    :type max_workers: int, optional
+    :param rate: maximum requests per second, defaults to
+        constants.PUBLISH_RATE
+    :type rate: float, optional
+    :param progress: called with the PublishReport as each object completes,
+        defaults to None, progress is logged every 100 objects
+    :type progress: callable, optional
+    :return: the counts of objects published / skipped and the failures
+    :rtype: PublishReport
+    """
+    object_names = spd.list_plot_objects(sats=sats,
+                                         area_types=area_types,
+                                         start_date=start_date,
+                                         end_date=end_date)
+    report = PublishReport(total=len(object_names))
+    LOGGER.info(f"publishing {report.total} objects")
+    rate_limiter = RateLimiter(rate)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tasks = {executor.submit(publish_object, spd.objstor, object_name,
+                                 rate_limiter, skip_public): object_name
+                 for object_name in object_names}
+        for task in concurrent.futures.as_completed(tasks):
+            object_name = tasks[task]
+            try:
+                report.add_result(object_name, published=task.result())
+            except Exception as err:
+                LOGGER.warning(f"unable to publish {object_name}: {err}")
+                report.add_result(object_name, error=err)
+            if progress:
+                progress(report)
+            elif report.get_completed() % 100 == 0:
+                LOGGER.info(f"publishing: {report}")
+    LOGGER.info(f"published: {report}")
+    return report
+
+
+def publish_object(objstor, object_name: str, rate_limiter: RateLimiter,
+                   skip_public: bool) -> bool:
+    """makes an object public, returns False if it was skipped as it already
+    was
+    """
+    if skip_public:
+        rate_limiter.wait()
+        with metrics.METRICS.objstore_request('get_public_permission'):
+            permission = objstor.get_public_permission(
+                object_name=object_name, bucket_name=None)
+        if permission == 'READ':
+            return False
+    rate_limiter.wait()
+    with metrics.METRICS.objstore_request('set_public_permissions'):
+        objstor.set_public_permissions(object_name=object_name)
+    return True
+
+
+def get_args(argv=None):
+    yesterday = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime('%Y.%m.%d')
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sat', nargs='+', choices=constants.SAT_OPTIONS,
+                        default=constants.SAT_OPTIONS,
+                        help='satellites to publish, defaults to all')
+    parser.add_argument('--area-type', nargs='+', choices=constants.WAT_BASIN_OPTIONS,
+                        default=constants.WAT_BASIN_OPTIONS,
+                        help='area types to publish, defaults to all')
+    parser.add_argument('--start-date', default=yesterday,
+                        help='first date to publish, YYYY.MM.DD, defaults to yesterday')
+    parser.add_argument('--end-date',
+                        help='last date to publish, YYYY.MM.DD, defaults to the start date')
+    parser.add_argument('--all-dates', action='store_true',
+                        help='publish every date in the archive')
+    parser.add_argument('--no-skip', action='store_true',
+                        help="don't check for, and skip, plots that are already public")
+    parser.add_argument('--workers', type=int, default=constants.PUBLISH_WORKERS,
+                        help='concurrent requests')
+    parser.add_argument('--rate', type=float, default=constants.PUBLISH_RATE,
+                        help='maximum requests per second, 0 for no limit')
+    args = parser.parse_args(argv)
+    for date_arg in ('start_date', 'end_date'):
+        date_str = getattr(args, date_arg)
+        if date_str and not data_interface.DATE_PATTERN.fullmatch(date_str):
+            parser.error(f'--{date_arg.replace("_", "-")} must be YYYY.MM.DD, got {date_str}')
+    return args
+
+
+def main(argv=None) -> int:
+    args = get_args(argv)
+    log_config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'logging.config')
+    logging.config.fileConfig(log_config_path)
+
+    start_date = end_date = None
+    if not args.all_dates:
+        start_date = args.start_date
+        end_date = args.end_date or args.start_date
+
+    spd = data_interface.SnowPackData(manifest_object=None)
+    report = publish(
+        spd,
+        sats=[data_interface.Satellite[sat_str] for sat_str in args.sat],
+        area_types=[data_interface.AreaType[area_type_str] for area_type_str in args.area_type],
+        start_date=start_date,
+        end_date=end_date,
+        skip_public=not args.no_skip,
+        max_workers=args.workers,
+        rate=args.rate)
+    for object_name, error in report.failed:
+        LOGGER.error(f"failed to publish {object_name}: {error}")
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
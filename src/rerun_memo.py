@@ -0,0 +1,40 @@
+"""memoizes the catalog queries made by one rerun of the streamlit script, so
+the widget callbacks, the sidebar and the image grid share the results rather
+than each querying the catalog again.
+
+A rerun is started with `start` and ended with `end`, on the thread running
+the script.  Outside of a rerun memoized functions are called directly.
+"""
+import functools
+import threading
+
+LOCAL = threading.local()
+
+
+def start():
+    """starts memoizing on the calling thread, widget callbacks run before
+    the script, so if they have already started the rerun it is continued
+    """
+    if getattr(LOCAL, 'results', None) is None:
+        LOCAL.results = {}
+
+
+def end():
+    LOCAL.results = None
+
+
+def memoized(func):
+    """decorator that returns the result of the first call of func with the
+    same arguments for the rest of the rerun.  The arguments must be
+    hashable, and the results should be treated as read only.
+    """
+    @functools.wraps(func)
+    def wrapper(*args):
+        results = getattr(LOCAL, 'results', None)
+        if results is None:
+            return func(*args)
+        key = (func.__qualname__,) + args
+        if key not in results:
+            results[key] = func(*args)
+        return results[key]
+    return wrapper
@@ -0,0 +1,41 @@
+"""starts the app: serves the metrics / health endpoints and starts warming up
+the catalog, then runs streamlit in the same process, so the sessions use the
+warmed up catalog.  Any arguments are passed on to `streamlit run`:
+
+    python serve.py --server.headless true
+
+The port is set with STREAMLIT_SERVER_PORT, rather than --server.port, so that
+readiness checks the same port.  The app should only be sent traffic once
+/readyz on METRICS_PORT returns 200.
+"""
+import logging
+import logging.config
+import os.path
+import sys
+
+import streamlit.web.cli
+
+import constants
+import metrics
+import warmup
+
+LOGGER = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    src_dir = os.path.dirname(os.path.realpath(__file__))
+    logging.config.fileConfig(os.path.join(src_dir, 'logging.config'))
+
+    if constants.METRICS_PORT:
+        metrics.start_server(port=constants.METRICS_PORT)
+    else:
+        LOGGER.warning("METRICS_PORT is 0, the health endpoints are not served")
+    warmup.WARM_UP.start()
+
+    sys.argv = ['streamlit', 'run', os.path.join(src_dir, 'main.py')] + argv
+    sys.exit(streamlit.web.cli.main())
+
+
+if __name__ == '__main__':
+    main()
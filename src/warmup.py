@@ -0,0 +1,209 @@
+"""warms the process up before it is sent traffic: loads the catalog, indexes
+the area names, and caches the images of the default page, so the first
+visitors to a new replica don't pay for the object store listings.  Progress
+is reported by the /healthz (liveness) and /readyz (readiness) routes of the
+metrics server.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+
+import constants
+import data_interface
+import image_cache
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class WarmUp():
+    """owns the SnowPackData and ImageCache shared by every session in the
+    process, and warms them up from a background thread.
+
+    The app is ready once the warm up has finished, the catalog has been
+    loaded, and streamlit is accepting connections.  A failed warm up isn't
+    retried, the catalog refresher keeps trying to load the catalog, and the
+    process becomes ready when it succeeds.
+    """
+    def __init__(self, app_port: int=constants.APP_PORT):
+        """
+        :param app_port: port streamlit serves the app on, readiness waits
+            for it to accept connections, None to skip the check, defaults to
+            constants.APP_PORT
+        :type app_port: int, optional
+        """
+        self.app_port = app_port
+        self.status = PENDING
+        self.error = None
+        self.seconds = None
+        self.thread = None
+        self.snowpack_data = None
+        self.image_cache = None
+        self.lock = threading.Lock()
+        self.snowpack_data_lock = threading.Lock()
+        self.image_cache_lock = threading.Lock()
+
+    def get_snowpack_data(self) -> data_interface.SnowPackData:
+        """returns the SnowPackData shared by the process, creating it and
+        loading the catalog on first use.  Callers made while the catalog
+        is loading wait for it.
+        """
+        if self.snowpack_data is None:
+            with self.snowpack_data_lock:
+                if self.snowpack_data is None:
+                    LOGGER.debug("creating the shared snowpack data object")
+                    spd = data_interface.SnowPackData(
+                        ttl=constants.CATALOG_TTL,
+                        background_refresh=constants.BACKGROUND_REFRESH)
+                    spd.warm_start(snapshot_path=constants.SNAPSHOT_PATH)
+                    metrics.METRICS.register_collector('snowpack_catalog', spd.get_stats)
+                    self.snowpack_data = spd
+        return self.snowpack_data
+
+    def get_image_cache(self) -> image_cache.ImageCache:
+        """returns the ImageCache shared by the process"""
+        if self.image_cache is None:
+            with self.image_cache_lock:
+                if self.image_cache is None:
+                    images = image_cache.ImageCache()
+                    metrics.METRICS.register_collector('snowpack_image_cache', images.get_stats)
+                    self.image_cache = images
+        return self.image_cache
+
+    def start(self) -> threading.Thread:
+        """starts warming up in a daemon thread, once per process
+
+        :return: the warm up thread
+        :rtype: threading.Thread
+        """
+        with self.lock:
+            if self.thread is None:
+                self.status = WARMING
+                self.thread = threading.Thread(target=self.run, name='warm-up',
+                                               daemon=True)
+                self.thread.start()
+        return self.thread
+
+    @metrics.timed
+    def run(self, image_dates: int=constants.WARMUP_IMAGE_DATES):
+        """loads the catalog and indexes the area names, then caches the
+        images of the default page
+
+        :param image_dates: number of the newest dates whose images are
+            cached, defaults to constants.WARMUP_IMAGE_DATES
+        :type image_dates: int, optional
+        """
+        start = time.perf_counter()
+        self.status = WARMING
+        try:
+            spd = self.get_snowpack_data()
+            images = self.get_image_cache()
+            # the area search of each area type
+            for area_type_str in constants.WAT_BASIN_OPTIONS:
+                spd.get_name_index(area_type=data_interface.AreaType[area_type_str])
+            if image_dates:
+                self.prefetch_images(spd, images, number_of_dates=image_dates)
+            self.status = READY
+        except Exception as err:
+            LOGGER.exception("warm up failed")
+            self.error = str(err)
+            self.status = FAILED
+        self.seconds = time.perf_counter() - start
+        LOGGER.info(f"warm up {self.status} after {self.seconds:.1f}s")
+
+    def prefetch_images(self,
+                        spd: data_interface.SnowPackData,
+                        images: image_cache.ImageCache,
+                        number_of_dates: int) -> int:
+        """caches the renditions shown by the default page, the default area
+        of the first area type for every satellite, for the newest
+        number_of_dates dates
+
+        :return: the number of renditions cached
+        :rtype: int
+        """
+        area_type = data_interface.AreaType[constants.WAT_BASIN_OPTIONS[0]]
+        sats = [data_interface.Satellite[sat_str] for sat_str in constants.SAT_OPTIONS]
+        dates = spd.get_available_dates(sats=sats,
+                                        area_type=area_type,
+                                        number_of_dates=constants.DAYS_BACK)
+        dates = sorted(dates, reverse=True)[0:number_of_dates]
+        url_matrix = spd.get_url_matrix(area_name=constants.DEFAULT_AREA_NAME,
+                                        dates=dates,
+                                        sats=sats,
+                                        area_type=area_type)
+        urls = [str(url) for sat_urls in url_matrix.values()
+                for url in sat_urls.values() if url]
+        renditions = images.get_renditions(urls)
+        cached = sum(1 for rendition in renditions.values() if rendition is not None)
+        LOGGER.info(f"cached {cached} of {len(urls)} images for the default page")
+        return cached
+
+    def is_app_serving(self) -> bool:
+        if not self.app_port:
+            return True
+        try:
+            with socket.create_connection(('127.0.0.1', self.app_port), timeout=0.5):
+                return True
+        except OSError:
+            return False
+
+    def is_live(self) -> bool:
+        """returns False if the catalog can no longer be kept up to date, ie
+        the refresher thread has died
+        """
+        spd = self.snowpack_data
+        return spd is None or spd.refresher is None or spd.refresher.is_alive()
+
+    def is_ready(self) -> bool:
+        spd = self.snowpack_data
+        return self.status in (READY, FAILED) and spd is not None and \
+            spd.data_retrieved and self.is_app_serving()
+
+    def get_status(self) -> dict:
+        """returns the warm up status and catalog age
+
+        :return: dictionary with the keys status, live, ready, error,
+            warmup_seconds and catalog_age_seconds
+        :rtype: dict
+        """
+        spd = self.snowpack_data
+        catalog_age = None
+        if spd is not None and spd.last_refresh is not None:
+            catalog_age = round(time.time() - spd.last_refresh, 1)
+        return {
+            'status': self.status,
+            'live': self.is_live(),
+            'ready': self.is_ready(),
+            'error': self.error,
+            'warmup_seconds': None if self.seconds is None else round(self.seconds, 3),
+            'catalog_age_seconds': catalog_age
+        }
+
+    def get_gauges(self) -> dict:
+        status = self.get_status()
+        return {
+            'ready': int(status['ready']),
+            'warmup_seconds': status['warmup_seconds'],
+        }
+
+    def healthz(self) -> tuple:
+        status = self.get_status()
+        return (200 if status['live'] else 503), 'application/json', json.dumps(status)
+
+    def readyz(self) -> tuple:
+        status = self.get_status()
+        return (200 if status['ready'] else 503), 'application/json', json.dumps(status)
+
+
+WARM_UP = WarmUp()
+metrics.add_route('/healthz', WARM_UP.healthz)
+metrics.add_route('/readyz', WARM_UP.readyz)
+metrics.METRICS.register_collector('snowpack_warmup', WARM_UP.get_gauges)
@@ -0,0 +1,19 @@
+"""runs the tests against the in process object store stand in used by the
+benchmarks, see benchmarks/fake_objstore.py
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+os.environ['METRICS_PORT'] = '0'
+os.environ.pop('SNAPSHOT_PATH', None)
+os.environ.pop('IMAGE_CACHE_DIR', None)
+os.environ.pop('MANIFEST_OBJECT', None)
+
+import fake_objstore  # noqa: E402
+
+ARCHIVE = fake_objstore.install()
@@ -0,0 +1,29 @@
+import datetime
+
+import conftest
+import data_interface
+
+
+def test_name_index_skips_partly_published_date():
+    """while the newest date is being published, only some of its areas are
+    listed and only for one satellite, the index uses the newest date every
+    satellite has
+    """
+    end_date = datetime.date.today() - datetime.timedelta(days=1)
+    newest_date = end_date.strftime('%Y.%m.%d')
+    conftest.ARCHIVE.generate(number_of_dates=5, number_of_areas=20,
+                              end_date=end_date)
+    conftest.ARCHIVE.keys = [
+        key for key in conftest.ARCHIVE.keys
+        if f'/{newest_date}/' not in key or
+        ('/modis/' in key and key.endswith('Area_00001_River.png'))]
+
+    spd = data_interface.SnowPackData(background_refresh=True,
+                                      manifest_object=None)
+    spd.refresh()
+    for area_type in data_interface.AreaType:
+        assert spd.get_available_dates(area_type=area_type)[-1] == newest_date
+        area_names = spd.get_area_names(area_type=area_type)
+        assert len(area_names) == 20
+        assert 'Boundary' in spd.get_name_index(area_type=area_type)
+        assert spd.search_area_names('area 00001', area_type=area_type)[0] == 'Area 00001 River'
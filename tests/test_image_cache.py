@@ -0,0 +1,78 @@
+import concurrent.futures
+import os
+import time
+
+import conftest
+import image_cache
+import metrics
+
+
+def test_concurrent_disk_writes(tmp_path):
+    """readers only see complete images while the same urls are rewritten,
+    and disk_bytes matches the images on disk after evictions
+    """
+    images = image_cache.ImageCache(cache_dir=str(tmp_path),
+                                    disk_budget=200 * 1024)
+    contents = [bytes([value]) * (20 * 1024 + value) for value in range(8)]
+    urls = [f'https://objectstore.example/plot_{url_num}.png' for url_num in range(12)]
+
+    def write_and_read(task_num):
+        url = urls[task_num % len(urls)]
+        images._write_disk(url, image_cache.CachedImage(
+            content=contents[task_num % len(contents)], etag=str(task_num)))
+        cached_image = images._read_disk(url)
+        # the image may have been evicted, but is never partly written
+        assert cached_image is None or cached_image.content in contents
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write_and_read, range(400)))
+
+    disk_bytes = sum(os.path.getsize(os.path.join(tmp_path, file_name))
+                     for file_name in os.listdir(tmp_path)
+                     if file_name.endswith('.img'))
+    assert images.disk_bytes == disk_bytes
+    assert disk_bytes <= images.disk_budget
+    assert not [file_name for file_name in os.listdir(tmp_path)
+                if file_name.endswith('.tmp')]
+
+
+def test_renditions_count_in_the_rerun():
+    """the requests get_renditions makes on its workers are added to the
+    rerun of the calling thread
+    """
+    images = image_cache.ImageCache(cache_dir=None)
+    urls = [f'https://objectstore.example/snowpack/plot_{url_num}.png'
+            for url_num in range(3)]
+    metrics.METRICS.start_rerun()
+    try:
+        renditions = images.get_renditions(urls)
+    finally:
+        summary = metrics.METRICS.end_rerun()
+    assert all(renditions.values())
+    assert summary['requests'] == {'get_object': 3}
+
+
+def test_rendition_hits_skip_the_source():
+    """cached renditions are served without reading the full resolution
+    image, which is only revalidated once the rendition is older than
+    max_age
+    """
+    images = image_cache.ImageCache(cache_dir=None, max_age=60)
+    url = 'https://objectstore.example/snowpack/plot.png'
+    rendition = images.get_rendition(url)
+    assert rendition
+    # the full resolution image is evicted from memory
+    images.memory_bytes -= len(images.memory.pop(url).content)
+    conftest.ARCHIVE.reset_requests()
+
+    assert images.get_rendition(url) == rendition
+    assert url not in images.memory
+    assert not conftest.ARCHIVE.requests
+
+    # once the rendition is stale the source is revalidated, and the
+    # rendition kept as the image hasn't changed
+    rendition_key = next(key for key in images.memory if key.startswith(f'{url}?'))
+    images.memory[rendition_key].checked -= 120
+    assert images.get_rendition(url) == rendition
+    assert conftest.ARCHIVE.requests['get_image'] == 1
+    assert time.time() - images.memory[rendition_key].checked < 60
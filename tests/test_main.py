@@ -0,0 +1,32 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+import conftest
+import warmup
+
+MAIN_PATH = os.path.join(conftest.ROOT_DIR, 'src', 'main.py')
+
+
+def test_empty_catalog(monkeypatch):
+    """when there are no areas, ie the catalog couldn't be loaded, the page
+    says so rather than drawing an empty grid for the default area
+    """
+    conftest.ARCHIVE.generate(number_of_dates=0, number_of_areas=0)
+    monkeypatch.setattr(warmup, 'WARM_UP', warmup.WarmUp(app_port=None))
+
+    app = AppTest.from_file(MAIN_PATH, default_timeout=30).run()
+    assert not app.exception
+    assert app.selectbox[0].options == []
+    assert app.session_state.area_name is None
+    assert '## No watersheds are available' in [markdown.value for markdown in app.markdown]
+    assert not app.button
+
+    # once the catalog is loaded the default area is shown
+    conftest.ARCHIVE.generate(number_of_dates=3, number_of_areas=2)
+    warmup.WARM_UP.get_snowpack_data().refresh()
+    app.run()
+    assert not app.exception
+    assert app.session_state.area_name == 'Boundary'
+    assert app.selectbox[0].options.count('Boundary') == 1
+    assert app.button
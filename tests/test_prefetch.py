@@ -0,0 +1,29 @@
+import time
+
+import conftest
+import data_interface
+
+
+def test_prefetch_timeout_applies_to_each_listing():
+    """listings queued behind others aren't timed out while they wait for a
+    worker, and a listing that runs past the timeout is given up on
+    """
+    conftest.ARCHIVE.generate(number_of_dates=3, number_of_areas=2)
+    spd = data_interface.SnowPackData(background_refresh=True,
+                                      manifest_object=None)
+    conftest.ARCHIVE.latency = 0.2
+    try:
+        # the 4 date listings take 0.8s one after the other
+        timings = spd.prefetch(date_strings=[], max_workers=1, timeout=0.5)
+        assert len(timings) == 4
+        assert not [timing for timing in timings if timing['error']]
+
+        spd.invalidate()
+        conftest.ARCHIVE.latency = 2.0
+        start = time.monotonic()
+        timings = spd.prefetch(date_strings=[], max_workers=2, timeout=0.3)
+        assert time.monotonic() - start < 1.5
+        assert len(timings) == 4
+        assert all(isinstance(timing['error'], TimeoutError) for timing in timings)
+    finally:
+        conftest.ARCHIVE.latency = 0.0
@@ -0,0 +1,28 @@
+import datetime
+
+import conftest
+import data_interface
+import publish
+
+
+def test_publish_skips_public_plots():
+    """publishes the plots for a date, and skips them when run again"""
+    end_date = datetime.date(2023, 3, 23)
+    conftest.ARCHIVE.generate(number_of_dates=3, number_of_areas=2,
+                              end_date=end_date)
+    spd = data_interface.SnowPackData(manifest_object=None)
+    object_names = spd.list_plot_objects(start_date='2023.03.22',
+                                         end_date='2023.03.22')
+    assert object_names
+    assert all('/2023.03.22/' in object_name for object_name in object_names)
+
+    report = publish.publish(spd, start_date='2023.03.22',
+                             end_date='2023.03.22', rate=0)
+    assert (report.published, report.skipped, report.failed) == \
+        (len(object_names), 0, [])
+    assert conftest.ARCHIVE.public == set(object_names)
+
+    report = publish.publish(spd, start_date='2023.03.22',
+                             end_date='2023.03.22', rate=0)
+    assert (report.published, report.skipped, report.failed) == \
+        (0, len(object_names), [])
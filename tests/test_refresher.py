@@ -0,0 +1,25 @@
+import conftest
+import constants
+import data_interface
+
+
+def test_failed_first_load_is_retried_with_backoff(monkeypatch):
+    """a failed load at start up is retried after the retry interval, well
+    before the start up probe gives up, rather than the pending interval
+    """
+    conftest.ARCHIVE.generate(number_of_dates=3, number_of_areas=2)
+
+    def unavailable(*args, **kwargs):
+        raise OSError('object storage unavailable')
+    monkeypatch.setattr(conftest.ARCHIVE, 'list', unavailable)
+
+    spd = data_interface.SnowPackData(background_refresh=True,
+                                      manifest_object=None)
+    spd.warm_start(snapshot_path=None)
+    try:
+        assert not spd.data_retrieved
+        assert spd.refresher.failures == 1
+        assert spd.refresher.get_delay() == constants.REFRESH_RETRY_INTERVAL
+        assert spd.refresher.get_delay() < constants.REFRESH_PENDING_INTERVAL
+    finally:
+        spd.refresher.stop()
@@ -0,0 +1,70 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+import conftest
+import data_interface
+
+THREADS = 8
+
+
+def get_dates_concurrently(spd: data_interface.SnowPackData) -> list:
+    """calls get_dates for the same satellite / area type from THREADS
+    threads at once, returning the futures
+    """
+    barrier = threading.Barrier(THREADS)
+
+    def get_dates():
+        barrier.wait()
+        return spd.get_dates(sat=data_interface.Satellite.modis,
+                             area_type=data_interface.AreaType.watersheds)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=THREADS) as executor:
+        futures = [executor.submit(get_dates) for _ in range(THREADS)]
+    return futures
+
+
+def test_concurrent_misses_share_one_listing():
+    conftest.ARCHIVE.generate(number_of_dates=5, number_of_areas=2)
+    spd = data_interface.SnowPackData(manifest_object=None)
+    conftest.ARCHIVE.reset_requests()
+    conftest.ARCHIVE.latency = 0.3
+    try:
+        futures = get_dates_concurrently(spd)
+    finally:
+        conftest.ARCHIVE.latency = 0.0
+    results = [future.result() for future in futures]
+    assert len(results[0]) == 5
+    assert all(result == results[0] for result in results)
+    assert conftest.ARCHIVE.requests['list_objects'] == 1
+    assert spd.single_flight.coalesced == THREADS - 1
+    assert not spd.single_flight.flights
+
+
+def test_followers_raise_the_leaders_error(monkeypatch):
+    conftest.ARCHIVE.generate(number_of_dates=5, number_of_areas=2)
+    spd = data_interface.SnowPackData(manifest_object=None)
+    listings = []
+
+    def unavailable(*args, **kwargs):
+        listings.append(args)
+        time.sleep(0.3)
+        raise OSError('object storage unavailable')
+    monkeypatch.setattr(conftest.ARCHIVE, 'list', unavailable)
+
+    futures = get_dates_concurrently(spd)
+    for future in futures:
+        with pytest.raises(OSError, match='object storage unavailable'):
+            future.result()
+    assert len(listings) == 1
+    assert spd.single_flight.coalesced == THREADS - 1
+    assert not spd.single_flight.flights
+
+    # the failed call isn't remembered, the next call lists again
+    monkeypatch.undo()
+    conftest.ARCHIVE.reset_requests()
+    dates = spd.get_dates(sat=data_interface.Satellite.modis,
+                          area_type=data_interface.AreaType.watersheds)
+    assert len(dates) == 5
+    assert conftest.ARCHIVE.requests['list_objects'] == 1
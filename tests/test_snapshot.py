@@ -0,0 +1,89 @@
+import sys
+import time
+
+import pytest
+
+import conftest
+import data_interface
+
+
+def get_snapshot() -> dict:
+    conftest.ARCHIVE.generate(number_of_dates=5, number_of_areas=3)
+    full = data_interface.SnowPackData(background_refresh=True,
+                                       manifest_object=None)
+    full.refresh()
+    return full.get_snapshot()
+
+
+def test_oversized_snapshot_keeps_newest_dates():
+    """a snapshot with more dates than the cache holds, ie the catalog
+    manifest, leaves the newest dates of every satellite / area type cached
+    """
+    conftest.ARCHIVE.generate(number_of_dates=30, number_of_areas=5)
+    full = data_interface.SnowPackData(background_refresh=True,
+                                       manifest_object=None,
+                                       max_entries=sys.maxsize)
+    full.refresh()
+    snapshot = full.get_snapshot()
+
+    small = data_interface.SnowPackData(background_refresh=True,
+                                        manifest_object=None,
+                                        max_entries=25)
+    assert small.set_snapshot(snapshot, source='test')
+    for sat in data_interface.Satellite:
+        for area_type in data_interface.AreaType:
+            newest_date = full.get_dates(sat=sat, area_type=area_type,
+                                         number_of_dates=1)[-1]
+            names = small.get_names(sat=sat, area_type=area_type,
+                                    date_str=newest_date)
+            assert 'Boundary' in names
+            url_matrix = small.get_url_matrix(area_name='Boundary',
+                                              dates=[newest_date],
+                                              sats=[sat],
+                                              area_type=area_type)
+            assert url_matrix[newest_date][sat]
+
+
+@pytest.mark.parametrize('background_refresh', [True, False])
+def test_snapshot_is_served_without_listing(background_refresh):
+    """the page is drawn from a loaded snapshot, rather than the first
+    request listing the archive
+    """
+    snapshot = get_snapshot()
+    spd = data_interface.SnowPackData(background_refresh=background_refresh,
+                                      manifest_object=None)
+    assert spd.set_snapshot(snapshot, source='test')
+    assert spd.data_retrieved
+    conftest.ARCHIVE.reset_requests()
+    dates = snapshot['dates']['modis/watersheds'][-2:]
+    url_matrix = spd.get_url_matrix(area_name='Boundary', dates=dates)
+    assert all(url for sat_urls in url_matrix.values() for url in sat_urls.values())
+    assert not conftest.ARCHIVE.requests
+
+
+def test_stale_snapshot_is_served_while_revalidated():
+    """a snapshot older than the ttl is served while it is reloaded in the
+    background
+    """
+    snapshot = get_snapshot()
+    snapshot['created'] -= 120
+    spd = data_interface.SnowPackData(ttl=60, manifest_object=None)
+    assert spd.set_snapshot(snapshot, source='test')
+    assert spd.is_stale()
+    conftest.ARCHIVE.reset_requests()
+    conftest.ARCHIVE.latency = 0.5
+    try:
+        start = time.monotonic()
+        date_str = snapshot['dates']['modis/watersheds'][-1]
+        url_matrix = spd.get_url_matrix(area_name='Boundary', dates=[date_str])
+        assert time.monotonic() - start < 0.25
+        assert url_matrix[date_str][data_interface.Satellite.modis]
+        # a second request shares the reload in progress
+        spd.get_url_matrix(area_name='Boundary', dates=[date_str])
+        deadline = time.monotonic() + 10
+        while spd.is_stale() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not spd.is_stale()
+        assert conftest.ARCHIVE.requests['list_objects'] == 1
+    finally:
+        conftest.ARCHIVE.latency = 0.0